@@ -0,0 +1,260 @@
+# app/cli.py
+# 无界面的命令行入口：查询错题、导出 PDF 练习卷、在同一进程中批量导出多份练习卷、批量导入错题，
+# 备份和恢复数据库与配图，以及清理未使用的配图。
+# 用法示例:
+#   python main.py export --grade 8年级 --subject 数学 --random 20 --out ws.pdf
+#   python main.py query --subject 数学 --keyword 方程 --limit 10
+#   python main.py batch jobs.txt      # 每行是一条 export 的参数，加 --no-repeat 时各份之间不重复出题
+#   python main.py import mistakes.csv --images images.zip
+#   python main.py backup D:/backups     # 增量备份，只打包上次备份后新增的配图
+#   python main.py restore D:/backups/folio-backup-20250101-020000-000000.tar.gz
+#   python main.py gc --dry-run          # 只报告可释放的空间
+import argparse
+import json
+import os
+import shlex
+import sys
+
+from app.data.database import init_db, get_mistakes, get_mistake_ids, LISTING_COLUMNS
+
+COMMANDS = ("export", "query", "batch", "import", "backup", "restore", "gc")
+
+
+def _add_filter_arguments(parser):
+    parser.add_argument("--grade", default="", help="年级，如 8年级")
+    parser.add_argument("--semester", default="", help="学期，如 上册")
+    parser.add_argument("--subject", default="", help="学科，如 数学")
+    parser.add_argument("--keyword", default="", help="在题目、答案和错误原因中全文检索")
+
+
+def _filters(args):
+    return {"grade": args.grade, "semester": args.semester, "subject": args.subject, "keyword": args.keyword}
+
+
+def _export_parser(prog="export"):
+    parser = argparse.ArgumentParser(prog=prog, description="将筛选出的错题导出为PDF")
+    _add_filter_arguments(parser)
+    parser.add_argument("--random", type=int, metavar="N", help="从筛选结果中随机抽取 N 道题")
+    parser.add_argument("--seed", type=int, help="随机种子，相同的种子和数据抽出相同的题目")
+    parser.add_argument("--out", required=True, help="输出的PDF文件路径")
+    return parser
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="启思录命令行工具（不带参数运行时启动图形界面）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = _export_parser()
+    subparsers.add_parser("export", parents=[export_parser], add_help=False,
+                          help=export_parser.description)
+
+    query_parser = subparsers.add_parser("query", help="按条件查询错题")
+    _add_filter_arguments(query_parser)
+    query_parser.add_argument("--limit", type=int, help="最多输出的条数")
+    query_parser.add_argument("--json", action="store_true", help="以 JSON Lines 输出完整记录")
+
+    batch_parser = subparsers.add_parser("batch", help="批量导出，文件中每行是一条 export 的参数（# 开头为注释）")
+    batch_parser.add_argument("jobs", help="任务文件路径，- 表示从标准输入读取")
+    batch_parser.add_argument("--no-repeat", action="store_true",
+                              help="随机抽题的各份练习卷之间不重复出题；此时种子相同的任务共用一个抽样器，"
+                                   "抽到的题目还取决于它们在任务文件中的先后顺序")
+
+    import_parser = subparsers.add_parser("import", help="从 CSV/JSON 文件批量导入错题，中断后再次运行会从中断处继续")
+    import_parser.add_argument("data", help="数据文件（.csv/.json/.jsonl）")
+    import_parser.add_argument("--images", help="配图所在的文件夹或 zip 压缩包，默认为数据文件所在目录")
+    import_parser.add_argument("--force", action="store_true", help="重新导入已完整导入过的文件")
+
+    backup_parser = subparsers.add_parser("backup", help="在线备份数据库和配图到指定目录（增量）")
+    backup_parser.add_argument("dir", help="备份目录")
+    backup_parser.add_argument("--full", action="store_true", help="打包全部配图，不依赖之前的备份")
+
+    restore_parser = subparsers.add_parser("restore", help="从备份恢复数据库和配图，恢复前校验全部文件")
+    restore_parser.add_argument("archive", help="备份压缩包路径")
+    restore_parser.add_argument("--verify-only", action="store_true", help="只校验备份，不修改当前数据")
+
+    gc_parser = subparsers.add_parser("gc", help="清理未被任何错题使用的配图和失效的预览缓存")
+    gc_parser.add_argument("--dry-run", action="store_true", help="只报告可释放的空间，不删除")
+    gc_parser.add_argument("--force", action="store_true", help="扫描结果看起来异常（大部分配图无引用等）时仍然删除")
+    gc_parser.add_argument("--grace-hours", type=float, default=24, help="跳过最近多少小时内修改的文件（默认 24）")
+    return parser
+
+
+class _ExportSession:
+    """
+    一次命令行运行中的导出环境：Qt 应用、WebEngine 和导出池只启动一次，供多份练习卷复用。
+    随机抽题默认每份练习卷使用新的抽样器，相同的种子和数据抽出相同的题目；
+    no_repeat 为 True 时种子相同的练习卷共用一个抽样器，彼此之间不重复出题。
+    """
+
+    def __init__(self, no_repeat=False):
+        # 无需显示任何窗口，使用 offscreen 平台
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtCore import QCoreApplication, Qt
+        from PySide6.QtGui import QGuiApplication
+        from app.utils.image_scheme import register_image_scheme
+
+        register_image_scheme()
+        QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+        self.app = QGuiApplication.instance() or QGuiApplication([sys.argv[0]])
+
+        from app.logic.mistake_service import MistakeService
+        from app.logic.review_sampler import ReviewSampler
+        self.service = MistakeService()
+        self.no_repeat = no_repeat
+        self._samplers = {}
+        self._sampler_class = ReviewSampler
+
+    def _sampler(self, seed):
+        if not self.no_repeat:
+            return self._sampler_class(seed=seed)
+        sampler = self._samplers.get(seed)
+        if sampler is None:
+            sampler = self._samplers[seed] = self._sampler_class(seed=seed)
+        return sampler
+
+    def export(self, args):
+        filters = _filters(args)
+        if args.random is not None:
+            mistake_ids = self._sampler(args.seed).sample_ids(args.random, filters)
+        else:
+            mistake_ids = get_mistake_ids(filters, listing_order=True)
+        if not mistake_ids:
+            print(f"{args.out}: 没有符合条件的错题", file=sys.stderr)
+            return False
+
+        def on_progress(done, total):
+            print(f"{args.out}: {done}/{total}", file=sys.stderr)
+
+        self.service.export_to_pdf(mistake_ids, args.out, progress=on_progress)
+        print(f"已导出 {len(mistake_ids)} 道错题到 {args.out}")
+        return True
+
+
+def _run_query(args):
+    rows = get_mistakes(_filters(args), limit=args.limit)
+    for row in rows:
+        if args.json:
+            print(json.dumps(dict(row), ensure_ascii=False))
+        else:
+            print("\t".join(str(row[column] if row[column] is not None else "") for column in LISTING_COLUMNS))
+    return 0
+
+
+def _run_batch(args):
+    if args.jobs == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.jobs, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    # 先解析全部任务，参数有误时不启动导出
+    parser = _export_parser(prog="batch")
+    jobs = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            jobs.append(parser.parse_args(shlex.split(line)))
+
+    session = _ExportSession(no_repeat=args.no_repeat)
+    failures = 0
+    for job in jobs:
+        try:
+            if not session.export(job):
+                failures += 1
+        except Exception as e:
+            failures += 1
+            print(f"{job.out}: 导出失败: {e}", file=sys.stderr)
+    print(f"完成 {len(jobs) - failures}/{len(jobs)} 份")
+    return 1 if failures else 0
+
+
+def _run_import(args):
+    from app.logic.importer import import_mistakes, MistakeImportError
+
+    def on_progress(done, total):
+        print(f"{done}/{total}", file=sys.stderr)
+
+    try:
+        result = import_mistakes(args.data, args.images, progress=on_progress, force=args.force)
+    except MistakeImportError as e:
+        print(f"导入失败: {e}", file=sys.stderr)
+        return 1
+    for row_number, error in result["errors"]:
+        print(f"第 {row_number} 行: {error}", file=sys.stderr)
+    resumed = f"（从第 {result['resumed_from'] + 1} 行继续）" if result["resumed_from"] else ""
+    print(f"已导入 {result['imported']} 道错题{resumed}，跳过 {len(result['errors'])} 行")
+    return 1 if result["errors"] else 0
+
+
+def _print_bytes_progress(done, total):
+    print(f"{done / 1048576:.1f}/{total / 1048576:.1f} MB", file=sys.stderr)
+
+
+def _run_backup(args):
+    from app.logic.backup import create_backup, BackupError
+    try:
+        result = create_backup(args.dir, full=args.full, progress=_print_bytes_progress)
+    except (BackupError, OSError) as e:
+        print(f"备份失败: {e}", file=sys.stderr)
+        return 1
+    print(f"已备份到 {result['archive']}（新增配图 {result['new_images']}/{result['total_images']}，"
+          f"{result['archive_size'] / 1048576:.1f} MB，用时 {result['elapsed']:.1f} 秒）")
+    return 0
+
+
+def _run_restore(args):
+    from app.logic.backup import restore_backup, verify_backup, BackupError
+    try:
+        if args.verify_only:
+            manifest = verify_backup(args.archive, progress=_print_bytes_progress)
+            print(f"校验通过（{manifest['created']}，配图 {len(manifest['images'])} 个）")
+        else:
+            restored = restore_backup(args.archive, progress=_print_bytes_progress)
+            print(f"已恢复数据库和 {restored} 个配图")
+    except (BackupError, OSError) as e:
+        print(f"恢复失败: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _run_gc(args):
+    from app.logic.image_gc import scan_orphans, collect_orphans
+    grace_seconds = args.grace_hours * 3600
+    scan = scan_orphans(grace_seconds)
+    print(f"检查了 {scan['scanned']} 个文件，{len(scan['orphans'])} 个未被使用，"
+          f"可释放 {scan['reclaimable_bytes'] / 1048576:.1f} MB")
+    if scan["warning"]:
+        print(f"警告: {scan['warning']}，数据库可能与配图目录不匹配", file=sys.stderr)
+    if args.dry_run or not scan["orphans"]:
+        return 0
+    if scan["warning"] and not args.force:
+        print("未删除任何文件，确认无误后可加 --force 重新运行", file=sys.stderr)
+        return 1
+    result = collect_orphans(scan["orphans"], grace_seconds)
+    print(f"已删除 {result['removed']} 个文件，释放 {result['freed_bytes'] / 1048576:.1f} MB")
+    return 0
+
+
+def main(argv=None):
+    """
+    命令行入口，返回进程退出码。
+    """
+    args = build_parser().parse_args(argv)
+    init_db()
+    if args.command == "query":
+        return _run_query(args)
+    if args.command == "batch":
+        return _run_batch(args)
+    if args.command == "import":
+        return _run_import(args)
+    if args.command == "backup":
+        return _run_backup(args)
+    if args.command == "restore":
+        return _run_restore(args)
+    if args.command == "gc":
+        return _run_gc(args)
+    try:
+        return 0 if _ExportSession().export(args) else 1
+    except Exception as e:
+        print(f"导出失败: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,135 @@
+# app/data/connection.py
+# SQLite 连接管理：每个线程复用一个长连接，统一设置 WAL 等参数，
+# 并提供上下文管理的事务接口。
+import atexit
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# 每个连接缓存的预编译语句数量
+STATEMENT_CACHE_SIZE = 256
+# 两次 PRAGMA optimize 之间的最短间隔（秒）
+OPTIMIZE_INTERVAL = 3600
+
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",   # 256 MB
+    "PRAGMA cache_size = -16000",     # 约 16 MB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
+class ConnectionManager:
+    """
+    按线程管理 SQLite 长连接。
+
+    WAL 模式下后台线程可以在界面线程写入的同时读取；
+    每个线程只使用自己的连接，写操作通过 transaction() 成组提交。
+    连接处于自动提交模式 (isolation_level=None)，事务边界完全由 transaction() 控制。
+    """
+
+    def __init__(self, db_file, optimize_interval=OPTIMIZE_INTERVAL):
+        self.db_file = db_file
+        self.optimize_interval = optimize_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._last_optimize = time.monotonic()
+        # 本进程内已提交的写事务计数，供缓存判断数据是否变化
+        self.write_generation = 0
+
+    def connection(self):
+        """
+        返回当前线程的连接，首次调用时创建并完成参数设置。
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, isolation_level=None,
+                                   cached_statements=STATEMENT_CACHE_SIZE,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for pragma in _CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        在当前线程的连接上开启写事务，正常退出时提交，发生异常时回滚。
+        可以嵌套使用，只有最外层负责提交。
+        """
+        conn = self.connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+            with self._lock:
+                self.write_generation += 1
+        finally:
+            self._local.depth = 0
+        self._maybe_optimize(conn)
+
+    def _maybe_optimize(self, conn):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_optimize < self.optimize_interval:
+                return
+            self._last_optimize = now
+        conn.execute("PRAGMA optimize")
+
+    def close_all(self):
+        """
+        关闭所有线程的连接，关闭前执行一次 PRAGMA optimize。
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"关闭数据库连接失败: {e}")
+        self._local = threading.local()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_connection_manager(db_file):
+    """
+    返回指定数据库文件的进程级连接管理器；数据库文件变化时替换旧的管理器。
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None or _manager.db_file != db_file:
+            if _manager is not None:
+                _manager.close_all()
+            _manager = ConnectionManager(db_file)
+        return _manager
+
+
+@atexit.register
+def _close_on_exit():
+    if _manager is not None:
+        _manager.close_all()
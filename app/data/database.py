@@ -1,20 +1,35 @@
 # app/data/database.py
 import sqlite3
 import os
+import random
+from array import array
+from datetime import date
+
+from app.data.connection import get_connection_manager
+from app.utils.katex_prerender import prerender_mistake, PRERENDER_FIELDS
+from app.utils.tracing import traced
 
 # 使用绝对路径，确保数据库文件在项目根目录下
 DB_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "database", "qisilu.db")
 DB_DIR = os.path.dirname(DB_FILE)
 
+# 列表摘要的 SQL 表达式：题目前 50 个字符，换行替换为空格，超长时加省略号。
+# 写入时和旧数据补全时共用，保证两处结果一致。
+_SUMMARY_SQL = ("CASE WHEN length({col}) > 50 "
+                "THEN replace(substr({col}, 1, 50), char(10), ' ') || '...' "
+                "ELSE replace({col}, char(10), ' ') END")
+
 def init_db():
     """
     初始化数据库，创建表。
     """
     if not os.path.exists(DB_DIR):
         os.makedirs(DB_DIR)
-    
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+
+    with transaction() as conn:
+        _create_schema(conn.cursor())
+
+def _create_schema(cursor):
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS mistakes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -30,122 +45,668 @@ def init_db():
         last_review_date DATE
     );
     """)
-    conn.commit()
-    conn.close()
+    _ensure_columns(cursor, "mistakes", {
+        # 保存时预渲染的公式 HTML，见 app.utils.katex_prerender
+        "question_html": "TEXT",
+        "answer_html": "TEXT",
+        "reason_html": "TEXT",
+        "render_errors": "TEXT",
+        "render_key": "TEXT",
+        # 列表显示用的题目摘要
+        "summary": "TEXT",
+        # 间隔重复复习计划，见 app.logic.scheduler
+        "ease_factor": "REAL DEFAULT 2.5",
+        "repetitions": "INTEGER DEFAULT 0",
+        "interval_days": "INTEGER DEFAULT 0",
+        "due_at": "DATE",
+    })
+    _migrate(cursor)
+    # 分类筛选（等值匹配）并按 id 倒序列出时可直接走索引范围扫描
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mistakes_category ON mistakes (grade, semester, subject, id DESC)")
+    # “某分类下今天到期的题”按 due_at 做索引范围扫描
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mistakes_category_due ON mistakes (grade, semester, subject, due_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mistakes_due ON mistakes (due_at)")
+    # 配图引用计数查询
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mistakes_image ON mistakes (question_image)")
+    # 批量导入的进度，与导入的数据在同一事务中更新，失败后可以从中断处继续
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        source_key TEXT PRIMARY KEY,
+        source_name TEXT,
+        rows_done INTEGER NOT NULL DEFAULT 0,
+        total_rows INTEGER,
+        finished INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT
+    )
+    """)
+    _init_fts(cursor)
+
+def _backfill_summary_and_due(cursor):
+    cursor.execute(f"UPDATE mistakes SET summary = {_SUMMARY_SQL.format(col='question_desc')} WHERE summary IS NULL")
+    # 从未安排过的错题从录入（或上次复习）当天起即为到期
+    cursor.execute("UPDATE mistakes SET due_at = COALESCE(last_review_date, record_date) WHERE due_at IS NULL")
+
+def _normalize_image_separators(cursor):
+    # 旧版本在 Windows 上以反斜杠保存配图路径，统一为 ImageStore 返回的正斜杠形式
+    cursor.execute("UPDATE mistakes SET question_image = replace(question_image, '\\', '/') "
+                   "WHERE instr(question_image, '\\') > 0")
+
+# 一次性数据迁移，按顺序执行；第 n 项执行后 PRAGMA user_version 记为 n。只能在末尾追加。
+_MIGRATIONS = (
+    _backfill_summary_and_due,
+    _normalize_image_separators,
+)
+
+def _migrate(cursor):
+    """
+    执行尚未执行过的一次性数据迁移。
+    已执行到的版本记录在 PRAGMA user_version 中，之后启动时不再全表扫描。
+    """
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(_MIGRATIONS, 1):
+        if version < target:
+            migration(cursor)
+    if version < len(_MIGRATIONS):
+        cursor.execute(f"PRAGMA user_version = {len(_MIGRATIONS)}")
+
+def _init_fts(cursor):
+    """
+    创建关键词搜索用的 FTS5 全文索引（trigram 分词，中文子串同样可以匹配），
+    覆盖题目、答案和错误原因，并由触发器与 mistakes 表保持同步。
+    当前 SQLite 不支持 FTS5/trigram 时跳过，关键词搜索回退为 LIKE。
+    """
+    _fts_available.pop(DB_FILE, None)
+    if _has_fts(cursor):
+        return
+    try:
+        cursor.execute("""
+        CREATE VIRTUAL TABLE mistakes_fts USING fts5(
+            question_desc, correct_answer, mistake_reason,
+            content='mistakes', content_rowid='id', tokenize='trigram'
+        );
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"全文索引不可用，关键词搜索将使用 LIKE: {e}")
+        return
+    _fts_available[DB_FILE] = True
+    # 逐条执行而不用 executescript，后者会提前提交外层事务
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS mistakes_fts_ai AFTER INSERT ON mistakes BEGIN
+        INSERT INTO mistakes_fts(rowid, question_desc, correct_answer, mistake_reason)
+        VALUES (new.id, new.question_desc, new.correct_answer, new.mistake_reason);
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS mistakes_fts_ad AFTER DELETE ON mistakes BEGIN
+        INSERT INTO mistakes_fts(mistakes_fts, rowid, question_desc, correct_answer, mistake_reason)
+        VALUES ('delete', old.id, old.question_desc, old.correct_answer, old.mistake_reason);
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS mistakes_fts_au AFTER UPDATE OF question_desc, correct_answer, mistake_reason ON mistakes BEGIN
+        INSERT INTO mistakes_fts(mistakes_fts, rowid, question_desc, correct_answer, mistake_reason)
+        VALUES ('delete', old.id, old.question_desc, old.correct_answer, old.mistake_reason);
+        INSERT INTO mistakes_fts(rowid, question_desc, correct_answer, mistake_reason)
+        VALUES (new.id, new.question_desc, new.correct_answer, new.mistake_reason);
+    END;
+    """)
+    # 为已有数据建立索引
+    cursor.execute("INSERT INTO mistakes_fts(mistakes_fts) VALUES ('rebuild')")
+
+# 各数据库文件是否有全文索引。索引只在 init_db 中创建，每个文件只查询一次 sqlite_master
+_fts_available = {}
+
+def _has_fts(cursor):
+    available = _fts_available.get(DB_FILE)
+    if available is None:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'mistakes_fts'")
+        available = _fts_available[DB_FILE] = cursor.fetchone() is not None
+    return available
+
+# trigram 分词要求检索词至少 3 个字符，更短的词只能用 LIKE 匹配
+FTS_MIN_TERM_LENGTH = 3
+# 全文检索命中不超过这么多条时按相关度排序。按相关度排序要为每条命中计算 bm25，
+# 命中更多时改按 id 倒序，直接按索引中的 rowid 顺序读取，翻页只读取当页的行
+FTS_RANK_LIMIT = 1000
+# 相关度排序，由 FTS5 在索引内部完成，结果按顺序逐行返回
+RANK_ORDER = "mistakes_fts.rank"
+_SNIPPET_SQL = "snippet(mistakes_fts, -1, '【', '】', '…', 16)"
+
+def _keyword_query(cursor, keyword):
+    """
+    构建关键词检索的 SQL 片段，返回 (from_clause, conditions, params, match, order_by)。
+    空格分隔的多个词之间为“与”关系；足够长的词走 FTS5 索引，match 为其 MATCH 表达式（否则为 None），
+    命中不超过 FTS_RANK_LIMIT 条时按相关度排序，否则按 id 倒序。
+    """
+    terms = keyword.split()
+    fts_terms = [t for t in terms if len(t) >= FTS_MIN_TERM_LENGTH]
+    like_terms = [t for t in terms if len(t) < FTS_MIN_TERM_LENGTH]
+    if fts_terms and not _has_fts(cursor):
+        like_terms, fts_terms = terms, []
+
+    conditions = []
+    params = []
+    for term in like_terms:
+        conditions.append("(mistakes.question_desc LIKE ? OR mistakes.correct_answer LIKE ? OR mistakes.mistake_reason LIKE ?)")
+        params.extend([f"%{term}%"] * 3)
+
+    if not fts_terms:
+        return "mistakes", conditions, params, None, "mistakes.id DESC"
+
+    # 每个词作为一个 FTS5 短语，双引号需要转义
+    match = " AND ".join('"' + t.replace('"', '""') + '"' for t in fts_terms)
+    # 最多数到 FTS_RANK_LIMIT + 1 条就停止，常见词也不会遍历全部命中
+    cursor.execute("SELECT count(*) FROM (SELECT 1 FROM mistakes_fts WHERE mistakes_fts MATCH ? LIMIT ?)",
+                   (match, FTS_RANK_LIMIT + 1))
+    ranked = cursor.fetchone()[0] <= FTS_RANK_LIMIT
+    return (
+        "mistakes_fts JOIN mistakes ON mistakes.id = mistakes_fts.rowid",
+        ["mistakes_fts MATCH ?"] + conditions,
+        [match] + params,
+        match,
+        RANK_ORDER if ranked else "mistakes_fts.rowid DESC",
+    )
+
+def _snippet_query(page_query, order_by):
+    """
+    为全文检索的一页结果加上 snippet 高亮摘要。page_query 已排序并截断，且选出 id 列；
+    外层只遍历一次命中列表，只为这一页中的行生成摘要。
+    order_by 中用 page.<列名> 引用 page_query 的列，参数为 page_query 的参数后接 MATCH 表达式。
+    """
+    # 固定以全文索引为外层；反过来对每行带 rowid 查询全文索引时，每次查询都要重新读取整个命中列表
+    return (f"SELECT page.*, {_SNIPPET_SQL} AS snippet FROM mistakes_fts "
+            f"CROSS JOIN ({page_query}) AS page ON page.id = mistakes_fts.rowid "
+            f"WHERE mistakes_fts MATCH ? ORDER BY {order_by}")
+
+def _ensure_columns(cursor, table, columns):
+    """
+    为已存在的旧数据库补充新增的列。
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, column_type in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
 
 def get_db_connection():
     """
-    获取数据库连接。
+    获取当前线程复用的数据库连接（见 app.data.connection）。
+    连接由连接管理器统一管理，调用方不要关闭它；写操作请使用 transaction()。
+    """
+    return get_connection_manager(DB_FILE).connection()
+
+def transaction():
+    """
+    返回写事务的上下文管理器，退出时提交，异常时回滚。
     """
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection_manager(DB_FILE).transaction()
 
+_INSERT_MISTAKE_SQL = """
+    INSERT INTO mistakes (subject, grade, semester, record_date, question_desc, question_image, correct_answer, mistake_reason,
+                          question_html, answer_html, reason_html, render_errors, render_key, summary, due_at)
+    VALUES (:subject, :grade, :semester, :record_date, :question_desc, :question_image, :correct_answer, :mistake_reason,
+            :question_html, :answer_html, :reason_html, :render_errors, :render_key, {summary}, :record_date)
+""".format(summary=_SUMMARY_SQL.format(col=':question_desc'))
+
+@traced("db.add_mistake")
 def add_mistake(data):
     """
     向数据库中添加一条新的错题记录。
     data 是一个包含错题信息的字典。
     """
+    row = {**data, **prerender_mistake(data)}
+    with transaction() as conn:
+        conn.execute(_INSERT_MISTAKE_SQL, row)
+
+@traced("db.add_mistakes", size=lambda count: count)
+def add_mistakes(data_list, prerender=True):
+    """
+    在一个事务中批量添加错题，返回添加的条数。
+    prerender 为 False 时跳过 LaTeX 预渲染（之后可用 backfill_rendered_html 补全）。
+    """
+    empty = {html_column: None for _, html_column in PRERENDER_FIELDS}
+    empty.update(render_errors=None, render_key=None)
+    count = 0
+
+    def rows():
+        nonlocal count
+        for data in data_list:
+            count += 1
+            yield {**data, **(prerender_mistake(data) if prerender else empty)}
+
+    with transaction() as conn:
+        conn.executemany(_INSERT_MISTAKE_SQL, rows())
+    return count
+
+# 分类筛选字段，取值来自固定的下拉框，按等值匹配
+CATEGORY_FILTER_FIELDS = ("grade", "semester", "subject")
+
+def _build_filter_query(cursor, filters):
+    """
+    根据筛选条件构建查询，返回 (from_clause, where_clause, params, match, order_by)，
+    match 为全文检索的 MATCH 表达式，未使用全文索引时为 None（见 _keyword_query）。
+    只接受 CATEGORY_FILTER_FIELDS 中的分类字段和 "keyword"，其他字段抛出 ValueError，
+    避免把任意列名拼接进 SQL。
+    """
+    filters = dict(filters or {})
+    keyword = filters.pop("keyword", "") or ""
+    unknown = [key for key in filters if key not in CATEGORY_FILTER_FIELDS]
+    if unknown:
+        raise ValueError(f"不支持的筛选字段: {', '.join(unknown)}")
+
+    from_clause, conditions, params, match, order_by = _keyword_query(cursor, keyword)
+    for key in CATEGORY_FILTER_FIELDS:
+        value = filters.get(key)
+        if value:
+            conditions.append(f"mistakes.{key} = ?")
+            params.append(value)
+
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return from_clause, where_clause, params, match, order_by
+
+def get_import_job(source_key):
+    """
+    返回批量导入任务的进度记录，没有记录时返回 None。
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO mistakes (subject, grade, semester, record_date, question_desc, question_image, correct_answer, mistake_reason)
-        VALUES (:subject, :grade, :semester, :record_date, :question_desc, :question_image, :correct_answer, :mistake_reason)
-    """, data)
-    conn.commit()
-    conn.close()
+    return conn.execute("SELECT * FROM import_jobs WHERE source_key = ?", (source_key,)).fetchone()
 
-def get_mistakes(filters=None):
+def save_import_progress(source_key, source_name, rows_done, total_rows, finished=False):
+    """
+    记录批量导入的进度。应与导入的数据在同一个 transaction() 中调用。
+    """
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO import_jobs (source_key, source_name, rows_done, total_rows, finished, updated_at)
+            VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
+            ON CONFLICT(source_key) DO UPDATE SET
+                source_name = excluded.source_name,
+                rows_done = excluded.rows_done,
+                total_rows = excluded.total_rows,
+                finished = excluded.finished,
+                updated_at = excluded.updated_at
+        """, (source_key, source_name, rows_done, total_rows, int(finished)))
+
+@traced("db.get_mistakes", size=len)
+def get_mistakes(filters=None, limit=None):
     """
     根据筛选条件从数据库中获取错题记录。
-    filters 是一个包含筛选条件的字典。
+    filters 是一个包含筛选条件的字典，其中 "keyword" 为关键词，
+    在题目、答案和错误原因中全文检索，命中时结果带有 snippet 高亮摘要，
+    命中不多时按相关度排序，否则按 id 倒序（见 FTS_RANK_LIMIT）。
+    limit 不为 None 时最多返回这么多条，在 SQL 中截断，不会读出其余的行，也不会为其余的行生成摘要。
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    
-    query = "SELECT * FROM mistakes"
-    params = []
-    
-    if filters:
-        conditions = []
-        for key, value in filters.items():
-            if value:
-                conditions.append(f"{key} LIKE ?")
-                params.append(f"%{value}%")
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-    
-    query += " ORDER BY id DESC"
-            
+
+    from_clause, where_clause, params, match, order_by = _build_filter_query(cursor, filters)
+    # 两种排序都按顺序逐行读出，摘要只为返回的行生成
+    snippet = f", {_SNIPPET_SQL} AS snippet" if match is not None else ""
+    query = f"SELECT mistakes.*{snippet} FROM {from_clause}{where_clause} ORDER BY {order_by}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(max(0, limit))
+
     cursor.execute(query, params)
-    mistakes = cursor.fetchall()
-    conn.close()
-    return mistakes
+    return cursor.fetchall()
 
-def update_mistake(mistake_id, data):
+# 列表可排序的列（表格列顺序），排序键只能取自这里
+LISTING_COLUMNS = ("id", "grade", "semester", "subject", "record_date", "summary")
+
+@traced("db.get_mistake_page", size=lambda result: len(result[0]))
+def get_mistake_page(filters=None, sort_column="id", descending=True, after=None, limit=200):
     """
-    更新数据库中的一条错题记录。
+    分页获取列表所需的字段（不含题目全文、答案和图片路径）。
+
+    按分类筛选或排序时使用键集分页：after 为上一页最后一行的 (排序值, id)；
+    关键词检索按相关度排序时（命中不超过 FTS_RANK_LIMIT 条）使用偏移分页：after 为已加载的行数。
+    关键词检索的结果带有 snippet 高亮摘要，只为返回的这一页生成。
+    返回 (rows, next_after)，没有更多数据时 next_after 为 None。
     """
+    if sort_column not in LISTING_COLUMNS:
+        raise ValueError(f"不支持的排序字段: {sort_column}")
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE mistakes SET
-            subject = :subject,
-            grade = :grade,
-            semester = :semester,
-            question_desc = :question_desc,
-            question_image = :question_image,
-            correct_answer = :correct_answer,
-            mistake_reason = :mistake_reason
-        WHERE id = :id
-    """, {**data, 'id': mistake_id})
-    conn.commit()
-    conn.close()
+    from_clause, where_clause, params, match, order_by = _build_filter_query(cursor, filters)
+    columns = ", ".join(f"mistakes.{c}" for c in LISTING_COLUMNS)
+
+    if match is None or sort_column != "id" or not descending:
+        ranked = False
+    elif after is not None:
+        # 翻页期间命中数越过 FTS_RANK_LIMIT 时，沿用第一页的分页方式
+        ranked = isinstance(after, int)
+    else:
+        ranked = order_by == RANK_ORDER
+    if ranked:
+        query = (f"SELECT {columns}, {RANK_ORDER} AS rank FROM {from_clause}{where_clause} "
+                 f"ORDER BY {RANK_ORDER} LIMIT ? OFFSET ?")
+        offset = after or 0
+        rows = cursor.execute(_snippet_query(query, "page.rank"), params + [limit, offset, match]).fetchall()
+        next_after = offset + len(rows) if len(rows) == limit else None
+        return rows, next_after
 
+    direction, compare = ("DESC", "<") if descending else ("ASC", ">")
+    # 全文检索时按索引的 rowid 排序和比较，按 id 排序时可以直接按索引顺序读取
+    id_column = "mistakes.id" if match is None else "mistakes_fts.rowid"
+    if sort_column == "id":
+        keyset = f"{id_column} {compare} ?"
+        key_params = [after[1]] if after is not None else []
+        order = f"{id_column} {direction}"
+        page_order = f"page.id {direction}"
+    else:
+        sort_key = f"mistakes.{sort_column}"
+        keyset = f"({sort_key} {compare} ? OR ({sort_key} = ? AND {id_column} {compare} ?))"
+        key_params = [after[0], after[0], after[1]] if after is not None else []
+        order = f"{sort_key} {direction}, {id_column} {direction}"
+        page_order = f"page.{sort_column} {direction}, page.id {direction}"
+    if after is not None:
+        where_clause += (" AND " if where_clause else " WHERE ") + keyset
+        params += key_params
+    query = f"SELECT {columns} FROM {from_clause}{where_clause} ORDER BY {order} LIMIT ?"
+    params.append(limit)
+    if match is not None:
+        query = _snippet_query(query, page_order)
+        params.append(match)
+    rows = cursor.execute(query, params).fetchall()
+    next_after = (rows[-1][sort_column], rows[-1]['id']) if len(rows) == limit else None
+    return rows, next_after
+
+@traced("db.update_mistake")
+def update_mistake(mistake_id, data):
+    """
+    更新数据库中的一条错题记录。
+    """
+    row = {**data, **prerender_mistake(data), 'id': mistake_id}
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE mistakes SET
+                subject = :subject,
+                grade = :grade,
+                semester = :semester,
+                question_desc = :question_desc,
+                question_image = :question_image,
+                correct_answer = :correct_answer,
+                mistake_reason = :mistake_reason,
+                question_html = :question_html,
+                answer_html = :answer_html,
+                reason_html = :reason_html,
+                render_errors = :render_errors,
+                render_key = :render_key,
+                summary = {summary}
+            WHERE id = :id
+        """.format(summary=_SUMMARY_SQL.format(col=':question_desc')), row)
+
+@traced("db.delete_mistake")
 def delete_mistake(mistake_id):
     """
     从数据库中删除一条错题记录。
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM mistakes WHERE id = ?", (mistake_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM mistakes WHERE id = ?", (mistake_id,))
+
+# 按 id 批量读写时每条语句的参数个数，避免超过 SQLite 的参数个数上限
+ID_BATCH_SIZE = 500
 
+@traced("db.delete_mistakes", size=lambda result: result[0])
+def delete_mistakes(mistake_ids):
+    """
+    在一个事务中删除多条错题记录，返回 (删除的条数, 被删除的错题用过的配图路径列表)。
+    配图是否仍被其他错题使用由调用方判断（见 ImageStore.release）。
+    """
+    mistake_ids = list(mistake_ids)
+    deleted = 0
+    images = set()
+    with transaction() as conn:
+        for start in range(0, len(mistake_ids), ID_BATCH_SIZE):
+            batch = mistake_ids[start:start + ID_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            images.update(row[0] for row in conn.execute(
+                f"SELECT DISTINCT question_image FROM mistakes WHERE id IN ({placeholders}) "
+                f"AND question_image IS NOT NULL", batch))
+            deleted += conn.execute(f"DELETE FROM mistakes WHERE id IN ({placeholders})", batch).rowcount
+    return deleted, sorted(images)
+
+@traced("db.recategorize_mistakes", size=lambda count: count)
+def recategorize_mistakes(mistake_ids, changes):
+    """
+    在一个事务中修改多条错题的分类（年级、学期、学科），返回修改的条数。
+    changes 只接受 CATEGORY_FILTER_FIELDS 中的字段，值为空的字段不修改；其他字段抛出 ValueError。
+    """
+    changes = {key: value for key, value in changes.items() if value}
+    unknown = [key for key in changes if key not in CATEGORY_FILTER_FIELDS]
+    if unknown:
+        raise ValueError(f"不支持批量修改的字段: {', '.join(unknown)}")
+    mistake_ids = list(mistake_ids)
+    if not changes or not mistake_ids:
+        return 0
+    assignments = ", ".join(f"{key} = ?" for key in changes)
+    updated = 0
+    with transaction() as conn:
+        for start in range(0, len(mistake_ids), ID_BATCH_SIZE):
+            batch = mistake_ids[start:start + ID_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            updated += conn.execute(f"UPDATE mistakes SET {assignments} WHERE id IN ({placeholders})",
+                                    [*changes.values(), *batch]).rowcount
+    return updated
+
+@traced("db.get_mistake_by_id")
 def get_mistake_by_id(mistake_id):
     """
     通过ID获取单个错题记录，主要用于获取图片路径。
     """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM mistakes WHERE id = ?", (mistake_id,))
-    mistake = cursor.fetchone()
-    conn.close()
-    return mistake
+    return conn.execute("SELECT * FROM mistakes WHERE id = ?", (mistake_id,)).fetchone()
 
+def get_mistake_image(mistake_id):
+    """
+    返回错题配图的路径，没有配图或错题不存在时返回 None。
+    """
+    conn = get_db_connection()
+    row = conn.execute("SELECT question_image FROM mistakes WHERE id = ?", (mistake_id,)).fetchone()
+    return row[0] if row else None
+
+def image_path_variants(image_path):
+    """
+    返回同一配图路径可能的存储形式（原样、正斜杠、反斜杠）。
+    配图统一以正斜杠的绝对路径保存（见 ImageStore.put_stream），旧版本在 Windows 上保存的是反斜杠路径，
+    按引用判断能否删除文件时需要同时匹配这几种形式。
+    """
+    return {image_path, image_path.replace("\\", "/"), image_path.replace("/", "\\")}
+
+def count_image_references(image_path):
+    """
+    返回使用该配图的错题数量，不区分路径分隔符。
+    """
+    variants = list(image_path_variants(image_path))
+    placeholders = ", ".join("?" * len(variants))
+    conn = get_db_connection()
+    return conn.execute(f"SELECT COUNT(*) FROM mistakes WHERE question_image IN ({placeholders})",
+                        variants).fetchone()[0]
+
+def get_referenced_images(paths=None):
+    """
+    返回错题引用的配图路径（去重，只扫描 question_image 索引）。
+    给出 paths 时只返回其中仍被引用的路径。
+    """
+    conn = get_db_connection()
+    if paths is None:
+        return [row[0] for row in conn.execute(
+            "SELECT DISTINCT question_image FROM mistakes WHERE question_image IS NOT NULL AND question_image != ''")]
+    paths = list(paths)
+    referenced = []
+    for start in range(0, len(paths), ID_BATCH_SIZE):
+        batch = paths[start:start + ID_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        referenced.extend(row[0] for row in conn.execute(
+            f"SELECT DISTINCT question_image FROM mistakes WHERE question_image IN ({placeholders})", batch))
+    return referenced
+
+@traced("db.get_random_mistakes", size=len)
 def get_random_mistakes(count, filters=None):
     """
     根据筛选条件随机获取指定数量的错题。
+    先按 id 随机探测（见 probe_random_ids）；匹配的题目过于稀疏时退回为读取全部匹配 id 再抽样，
+    两种方式都不再对所有匹配行 ORDER BY RANDOM()。
+    需要固定种子或跨次不重复抽取时使用 app.logic.review_sampler.ReviewSampler。
+    """
+    ids = probe_random_ids(count, filters)
+    if len(ids) < count:
+        all_ids = get_mistake_ids(filters)
+        ids = [all_ids[i] for i in random.sample(range(len(all_ids)), min(count, len(all_ids)))]
+    return get_mistakes_by_ids(ids)
+
+# 随机探测时每批生成的候选 id 数，以及平均每抽一题允许的探测次数
+PROBE_BATCH_SIZE = 64
+PROBE_LIMIT_PER_PICK = 256
+
+def probe_random_ids(count, filters=None, rng=random, exclude=()):
+    """
+    在 [最小 id, 最大 id] 中均匀生成候选 id，保留存在且符合筛选条件、不在 exclude 中的前 count 个。
+    每次探测只是一次主键查找，抽 k 题约为 O(k log n)，且结果在匹配行中均匀分布。
+    关键词检索不适合逐 id 探测，匹配行占比过低时探测次数也会超限，
+    这两种情况下返回的 id 少于 count，由调用方改用 get_mistake_ids 抽样。
+    """
+    if (filters or {}).get("keyword"):
+        return []
+    low, high = get_id_range()
+    if low is None:
+        return []
+    picked = []
+    seen = set(exclude)
+    probes = 0
+    while len(picked) < count and probes < count * PROBE_LIMIT_PER_PICK:
+        candidates = [rng.randint(low, high) for _ in range(PROBE_BATCH_SIZE)]
+        probes += PROBE_BATCH_SIZE
+        hits = filter_existing_ids(candidates, filters)
+        for candidate in candidates:
+            if candidate in hits and candidate not in seen:
+                picked.append(candidate)
+                seen.add(candidate)
+                if len(picked) == count:
+                    break
+    return picked
+
+@traced("db.get_mistake_ids", size=len)
+def get_mistake_ids(filters=None, listing_order=False):
+    """
+    返回符合筛选条件的错题 id，以紧凑的整型数组保存。
+    默认按 id 升序；listing_order 为 True 时与 get_mistakes 的顺序相同。
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    
-    query = "SELECT * FROM mistakes"
-    params = []
+    from_clause, where_clause, params, _, order_by = _build_filter_query(cursor, filters)
+    if not listing_order:
+        order_by = "mistakes.id"
+    cursor.execute(f"SELECT mistakes.id FROM {from_clause}{where_clause} ORDER BY {order_by}", params)
+    return array('q', (row[0] for row in cursor))
 
-    if filters:
-        conditions = []
-        for key, value in filters.items():
-            if value:
-                conditions.append(f"{key} LIKE ?")
-                params.append(f"%{value}%")
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-
-    query += " ORDER BY RANDOM() LIMIT ?"
-    params.append(count)
-    
-    cursor.execute(query, params)
-    mistakes = cursor.fetchall()
-    conn.close()
-    return mistakes
\ No newline at end of file
+@traced("db.get_due_mistakes", size=len)
+def get_due_mistakes(count, filters=None, today=None):
+    """
+    获取截至 today（默认今天，格式 YYYY-MM-DD）已到期的错题，逾期最久的排在前面。
+    分类筛选完整时为 idx_mistakes_category_due 上的索引范围扫描。
+    """
+    today = today or date.today().isoformat()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    from_clause, where_clause, params, _, _ = _build_filter_query(cursor, filters)
+    where_clause += (" AND " if where_clause else " WHERE ") + "mistakes.due_at <= ?"
+    cursor.execute(f"SELECT mistakes.* FROM {from_clause}{where_clause} "
+                   f"ORDER BY mistakes.due_at, mistakes.id LIMIT ?", params + [today, count])
+    return cursor.fetchall()
+
+def update_review_schedule(mistake_id, schedule, review_date):
+    """
+    记录一次复习：复习次数加一，并写入新的复习计划。
+    schedule 包含 ease_factor、repetitions、interval_days 和 due_at。
+    """
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE mistakes SET
+                review_count = COALESCE(review_count, 0) + 1,
+                last_review_date = :review_date,
+                ease_factor = :ease_factor,
+                repetitions = :repetitions,
+                interval_days = :interval_days,
+                due_at = :due_at
+            WHERE id = :id
+        """, {**schedule, 'review_date': review_date, 'id': mistake_id})
+
+def get_id_range():
+    """
+    返回 (最小 id, 最大 id)，表为空时返回 (None, None)。两者都直接取自主键 B 树两端。
+    """
+    conn = get_db_connection()
+    # 分成两个子查询，SQLite 才会对 MIN/MAX 使用索引端点优化
+    return tuple(conn.execute("SELECT (SELECT MIN(id) FROM mistakes), (SELECT MAX(id) FROM mistakes)").fetchone())
+
+def filter_existing_ids(ids, filters=None):
+    """
+    返回 ids 中存在且符合筛选条件的 id 集合，每个 id 只是一次主键查找。
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    from_clause, where_clause, params, _, _ = _build_filter_query(cursor, filters)
+    ids = list(set(ids))
+    placeholders = ", ".join("?" * len(ids))
+    where_clause += (" AND " if where_clause else " WHERE ") + f"mistakes.id IN ({placeholders})"
+    cursor.execute(f"SELECT mistakes.id FROM {from_clause}{where_clause}", params + ids)
+    return {row[0] for row in cursor}
+
+@traced("db.get_mistakes_by_ids", size=len)
+def get_mistakes_by_ids(ids):
+    """
+    按给定顺序返回对应 id 的完整错题记录，不存在的 id 会被跳过。
+    """
+    if not ids:
+        return []
+    conn = get_db_connection()
+    rows = {}
+    # 分批查询，避免超过 SQLite 的参数个数上限
+    for start in range(0, len(ids), ID_BATCH_SIZE):
+        batch = list(ids[start:start + ID_BATCH_SIZE])
+        placeholders = ", ".join("?" * len(batch))
+        for row in conn.execute(f"SELECT * FROM mistakes WHERE id IN ({placeholders})", batch):
+            rows[row['id']] = row
+    return [rows[i] for i in ids if i in rows]
+
+def get_data_generation():
+    """
+    返回标识数据库内容版本的值：本进程的写事务计数加上 SQLite 的 data_version
+    （后者在其他连接或进程提交后变化）。值不变说明数据未被修改。
+    """
+    manager = get_connection_manager(DB_FILE)
+    data_version = manager.connection().execute("PRAGMA data_version").fetchone()[0]
+    return manager.write_generation, data_version
+
+def backfill_rendered_html(batch_size=200, force=False, progress=None):
+    """
+    为预渲染结果缺失或已失效（文本或 KaTeX 版本变化）的错题重新预渲染。
+    progress(done, total) 为可选的进度回调。返回更新的条数。
+    """
+    from app.utils.katex_prerender import compute_render_key
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, question_desc, correct_answer, mistake_reason, render_key FROM mistakes")
+    stale = [dict(row) for row in cursor.fetchall()
+             if force or row['render_key'] != compute_render_key(
+                 row['question_desc'], row['correct_answer'], row['mistake_reason'])]
+
+    for start in range(0, len(stale), batch_size):
+        batch = stale[start:start + batch_size]
+        rows = [{**prerender_mistake(row), 'id': row['id']} for row in batch]
+        with transaction():
+            cursor.executemany("""
+                UPDATE mistakes SET
+                    question_html = :question_html,
+                    answer_html = :answer_html,
+                    reason_html = :reason_html,
+                    render_errors = :render_errors,
+                    render_key = :render_key
+                WHERE id = :id
+            """, rows)
+        if progress:
+            progress(start + len(batch), len(stale))
+    return len(stale)
@@ -0,0 +1,387 @@
+# app/logic/backup.py
+# 在线增量备份：数据库用 SQLite 在线备份 API 分页复制，程序可以照常使用；
+# 配图按清单只打包上次备份之后新增或修改的文件，与数据库一起流式写入 tar.gz 压缩包。
+# 每个压缩包附带一份同名的 .manifest.json，记录本次快照中所有配图所在的压缩包和校验和，
+# 恢复时按清单从各压缩包中取出所需的文件并校验。
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+
+from app.data import database
+from app.logic import image_store
+
+BACKUP_PREFIX = "folio-backup-"
+ARCHIVE_SUFFIX = ".tar.gz"
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+# 压缩包内的成员名
+DB_MEMBER = "database/qisilu.db"
+IMAGE_MEMBER_PREFIX = "images/"
+MANIFEST_MEMBER = "manifest.json"
+# 在线备份每一步复制的页数，两步之间释放读锁，程序的写入不会被长时间阻塞
+BACKUP_PAGES_PER_STEP = 1024
+# 配图大多已经是压缩格式，使用较低的压缩级别以加快备份
+COMPRESS_LEVEL = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    """
+    备份或恢复失败（文件缺失、校验和不符等）。
+    """
+
+
+class BackupCancelled(BackupError):
+    """
+    备份或恢复被用户取消。
+    """
+
+
+class _HashingReader:
+    """
+    读取文件的同时计算 sha256，用于边写入压缩包边计算校验和。
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.digest.update(data)
+        self.size += len(data)
+        return data
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _scan_images(images_dir):
+    """
+    列出图片库中的文件，返回 {相对路径: os.stat_result}。
+    跳过预览缓存目录、写入中的临时文件和隐藏文件。
+    """
+    files = {}
+    for root, dirs, names in os.walk(images_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".")
+                   and not (root == images_dir and d == image_store.PREVIEW_DIR_NAME)]
+        for name in names:
+            if name.startswith(".") or name.endswith(image_store.TEMP_SUFFIX):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, images_dir).replace(os.sep, "/")
+            files[rel] = os.stat(path)
+    return files
+
+
+def list_backups(backup_dir):
+    """
+    按时间从旧到新返回备份目录中的压缩包路径（只列出带清单的完整备份）。
+    """
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(name for name in os.listdir(backup_dir)
+                   if name.startswith(BACKUP_PREFIX) and name.endswith(ARCHIVE_SUFFIX)
+                   and os.path.exists(os.path.join(backup_dir, name[:-len(ARCHIVE_SUFFIX)] + MANIFEST_SUFFIX)))
+    return [os.path.join(backup_dir, name) for name in names]
+
+
+def _manifest_path(archive_path):
+    return archive_path[:-len(ARCHIVE_SUFFIX)] + MANIFEST_SUFFIX
+
+
+def read_manifest(archive_path):
+    """
+    读取压缩包的清单。优先读取旁边的 .manifest.json，没有时从压缩包中读取。
+    """
+    try:
+        with open(_manifest_path(archive_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    try:
+        with tarfile.open(archive_path, "r|gz") as tar:
+            for member in tar:
+                if member.name == MANIFEST_MEMBER:
+                    return json.load(tar.extractfile(member))
+    except (OSError, tarfile.TarError, ValueError) as e:
+        raise BackupError(f"读取备份清单失败: {e}") from e
+    raise BackupError(f"{os.path.basename(archive_path)} 中没有备份清单")
+
+
+def _backup_database(db_file, target_path, progress):
+    """
+    用在线备份 API 分页把数据库复制到 target_path，progress(done_bytes, total_bytes) 返回 False 时取消。
+    """
+    source = sqlite3.connect(db_file)
+    target = sqlite3.connect(target_path)
+    try:
+        page_size = source.execute("PRAGMA page_size").fetchone()[0]
+
+        def on_step(status, remaining, total):
+            if progress is not None and progress((total - remaining) * page_size, total * page_size) is False:
+                raise BackupCancelled("备份已取消")
+
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=on_step)
+    finally:
+        target.close()
+        source.close()
+
+
+def create_backup(backup_dir, full=False, progress=None):
+    """
+    创建一次备份，返回结果字典:
+    archive（压缩包路径）、new_images（本次打包的配图数）、total_images（快照中的配图总数）、
+    archive_size（压缩包字节数）、elapsed（耗时秒数）。
+
+    配图按大小和修改时间与上一次备份的清单比较，未变化的只在清单中引用之前的压缩包；
+    之前的压缩包不存在时重新打包。full 为 True 时打包全部配图。
+    progress(done, total) 按字节报告进度，返回 False 时取消并抛出 BackupCancelled。
+    """
+    started = time.perf_counter()
+    os.makedirs(backup_dir, exist_ok=True)
+    images_dir = image_store.IMAGES_DIR
+
+    previous = {}
+    backups = list_backups(backup_dir)
+    if backups and not full:
+        previous = read_manifest(backups[-1]).get("images", {})
+    existing_archives = {os.path.basename(path) for path in backups}
+
+    current = _scan_images(images_dir)
+    images = {}
+    new_files = []
+    for rel, st in current.items():
+        entry = previous.get(rel)
+        if (entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+                and entry["archive"] in existing_archives):
+            images[rel] = entry
+        else:
+            new_files.append((rel, st))
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    archive_name = f"{BACKUP_PREFIX}{stamp}{ARCHIVE_SUFFIX}"
+    archive_path = os.path.join(backup_dir, archive_name)
+    db_file = database.DB_FILE
+
+    with tempfile.TemporaryDirectory(dir=backup_dir, prefix=".backup-") as staging:
+        # 数据库先完整备份到临时文件，再写入压缩包
+        db_copy = os.path.join(staging, "qisilu.db")
+        db_size = os.path.getsize(db_file)
+        images_size = sum(st.st_size for _, st in new_files)
+        total = db_size + images_size
+
+        def db_progress(done, db_total):
+            nonlocal total
+            total = db_total + images_size
+            return progress(done, total) if progress is not None else None
+
+        _backup_database(db_file, db_copy, db_progress)
+        db_size = os.path.getsize(db_copy)
+        total = db_size + images_size
+
+        partial_path = os.path.join(staging, archive_name)
+        with tarfile.open(partial_path, "w:gz", compresslevel=COMPRESS_LEVEL) as tar:
+            with open(db_copy, "rb") as f:
+                reader = _HashingReader(f)
+                tar.addfile(tar.gettarinfo(db_copy, arcname=DB_MEMBER), reader)
+            database_entry = {"sha256": reader.digest.hexdigest(), "size": reader.size}
+            done = db_size
+            packed = 0
+
+            for rel, st in new_files:
+                path = os.path.join(images_dir, *rel.split("/"))
+                info = tarfile.TarInfo(IMAGE_MEMBER_PREFIX + rel)
+                info.size = st.st_size
+                info.mtime = int(st.st_mtime)
+                try:
+                    with open(path, "rb") as f:
+                        reader = _HashingReader(f)
+                        tar.addfile(info, reader)
+                except FileNotFoundError:
+                    # 扫描之后被删除的配图不计入本次快照
+                    continue
+                images[rel] = {"sha256": reader.digest.hexdigest(), "size": st.st_size,
+                               "mtime_ns": st.st_mtime_ns, "archive": archive_name}
+                packed += 1
+                done += st.st_size
+                if progress is not None and progress(done, total) is False:
+                    raise BackupCancelled("备份已取消")
+
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "archive": archive_name,
+                "parent": os.path.basename(backups[-1]) if backups and not full else None,
+                "database": database_entry,
+                "images": images,
+            }
+            manifest_bytes = json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8")
+            info = tarfile.TarInfo(MANIFEST_MEMBER)
+            info.size = len(manifest_bytes)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(manifest_bytes))
+
+        # 清单最后写入，只有压缩包和清单都完成的备份才会被 list_backups 列出
+        os.replace(partial_path, archive_path)
+        manifest_tmp = os.path.join(staging, "manifest.json")
+        with open(manifest_tmp, "wb") as f:
+            f.write(manifest_bytes)
+        os.replace(manifest_tmp, _manifest_path(archive_path))
+
+    return {"archive": archive_path, "new_images": packed, "total_images": len(images),
+            "archive_size": os.path.getsize(archive_path), "elapsed": time.perf_counter() - started}
+
+
+def _safe_relpath(rel):
+    """
+    清单中的相对路径不得跳出目标目录。
+    """
+    norm = os.path.normpath(rel)
+    if os.path.isabs(norm) or norm.startswith("..") or ":" in rel:
+        raise BackupError(f"备份清单中的路径无效: {rel}")
+    return norm
+
+
+def _extract_verified(backup_dir, manifest, wanted_images, staging, progress):
+    """
+    从各压缩包中取出数据库和 wanted_images 中的配图到 staging，边解压边校验 sha256。
+    返回 staging 中的数据库路径。
+    """
+    by_archive = {}
+    for rel in wanted_images:
+        by_archive.setdefault(manifest["images"][rel]["archive"], set()).add(rel)
+    target_archive = manifest["archive"]
+    by_archive.setdefault(target_archive, set())
+
+    total = manifest["database"]["size"] + sum(manifest["images"][rel]["size"] for rel in wanted_images)
+    done = 0
+    db_path = None
+    for archive_name, rels in by_archive.items():
+        archive_path = os.path.join(backup_dir, archive_name)
+        if not os.path.exists(archive_path):
+            raise BackupError(f"缺少备份文件 {archive_name}")
+        pending = {IMAGE_MEMBER_PREFIX + rel: rel for rel in rels}
+        if archive_name == target_archive:
+            pending[DB_MEMBER] = None
+        try:
+            with tarfile.open(archive_path, "r|gz") as tar:
+                for member in tar:
+                    if member.name not in pending or not member.isfile():
+                        continue
+                    rel = pending.pop(member.name)
+                    if rel is None:
+                        expected = manifest["database"]
+                        out_path = db_path = os.path.join(staging, "qisilu.db")
+                    else:
+                        expected = manifest["images"][rel]
+                        out_path = os.path.join(staging, "images", _safe_relpath(rel))
+                        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                    reader = _HashingReader(tar.extractfile(member))
+                    with open(out_path, "wb") as f:
+                        for chunk in iter(lambda: reader.read(CHUNK_SIZE), b""):
+                            f.write(chunk)
+                    if reader.digest.hexdigest() != expected["sha256"] or reader.size != expected["size"]:
+                        raise BackupError(f"{archive_name} 中的 {member.name} 校验和不符，备份已损坏")
+                    done += reader.size
+                    if progress is not None and progress(done, total) is False:
+                        raise BackupCancelled("恢复已取消")
+                    if not pending:
+                        break
+        except (OSError, tarfile.TarError, EOFError) as e:
+            raise BackupError(f"读取 {archive_name} 失败: {e}") from e
+        if pending:
+            raise BackupError(f"{archive_name} 中缺少 {', '.join(sorted(pending))}")
+    return db_path
+
+
+def verify_backup(archive_path, progress=None):
+    """
+    完整校验一次备份（数据库和快照中的全部配图），不修改当前数据。
+    校验失败时抛出 BackupError，成功时返回清单。
+    """
+    manifest = read_manifest(archive_path)
+    backup_dir = os.path.dirname(os.path.abspath(archive_path))
+    with tempfile.TemporaryDirectory(dir=backup_dir, prefix=".verify-") as staging:
+        _extract_verified(backup_dir, manifest, list(manifest["images"]), staging, progress)
+    return manifest
+
+
+def _rebase_image_paths(conn, manifest, images_dir):
+    """
+    将恢复出的数据库中的配图路径改写为当前配图目录下的规范路径（正斜杠的绝对路径），返回改写的路径数。
+    数据库记录的是备份时的绝对路径，在其他位置或其他电脑上恢复后目录不同；
+    按文件名对应快照中的配图或当前目录中已有的文件，找不到的路径保持不变。
+    """
+    snapshot = {os.path.basename(rel): rel for rel in manifest["images"]}
+    rewrites = []
+    for (path,) in conn.execute("SELECT DISTINCT question_image FROM mistakes "
+                                "WHERE question_image IS NOT NULL AND question_image != ''"):
+        name = os.path.basename(path.replace("\\", "/"))
+        rel = snapshot.get(name)
+        if rel is not None:
+            local_path = os.path.join(images_dir, _safe_relpath(rel))
+        elif os.path.isfile(os.path.join(images_dir, name)):
+            local_path = os.path.join(images_dir, name)
+        else:
+            continue
+        canonical = os.path.abspath(local_path).replace("\\", "/")
+        if canonical != path:
+            rewrites.append((canonical, path))
+    with conn:
+        conn.executemany("UPDATE mistakes SET question_image = ? WHERE question_image = ?", rewrites)
+    return len(rewrites)
+
+
+def restore_backup(archive_path, progress=None):
+    """
+    从备份恢复数据库和配图，所有文件校验通过后才会修改当前数据。
+    数据库通过在线备份 API 写回，程序中已打开的连接无需重新打开；
+    写回前其中的配图路径改写为当前配图目录下的路径，恢复到其他位置后配图仍然可用。
+    本地已有且校验和一致的配图不再解压；不在快照中的本地配图保留不动。
+    返回恢复的配图数。
+    """
+    manifest = read_manifest(archive_path)
+    backup_dir = os.path.dirname(os.path.abspath(archive_path))
+    images_dir = image_store.IMAGES_DIR
+
+    wanted = []
+    for rel, entry in manifest["images"].items():
+        local_path = os.path.join(images_dir, _safe_relpath(rel))
+        if (not os.path.isfile(local_path) or os.path.getsize(local_path) != entry["size"]
+                or _file_sha256(local_path) != entry["sha256"]):
+            wanted.append(rel)
+
+    with tempfile.TemporaryDirectory(dir=backup_dir, prefix=".restore-") as staging:
+        db_path = _extract_verified(backup_dir, manifest, wanted, staging, progress)
+
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(database.DB_FILE, timeout=30)
+        try:
+            _rebase_image_paths(source, manifest, images_dir)
+            source.backup(target, pages=BACKUP_PAGES_PER_STEP)
+        except sqlite3.Error as e:
+            raise BackupError(f"恢复数据库失败: {e}") from e
+        finally:
+            target.close()
+            source.close()
+        # 备份可能来自旧版本：补齐表结构和全文索引，并重新检查全文索引是否可用
+        database.init_db()
+
+        for rel in wanted:
+            local_path = os.path.join(images_dir, _safe_relpath(rel))
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            os.replace(os.path.join(staging, "images", _safe_relpath(rel)), local_path)
+    return len(wanted)
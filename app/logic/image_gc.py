@@ -0,0 +1,170 @@
+# app/logic/image_gc.py
+# 清理配图目录中不再被任何错题引用的文件：取消的新增对话框、编辑时重新上传、
+# 导入失败等都会留下无引用的图片，缩小后的预览图缓存在原图删除或修改后也会失效。
+import os
+import time
+
+from app.data.database import get_data_generation, get_referenced_images
+from app.logic import image_store
+
+# 修改时间在这段时间之内的文件不清理，正在编辑、尚未保存的错题已经上传的图片不会被误删
+GC_GRACE_SECONDS = image_store.UNREFERENCED_GRACE_SECONDS
+# 每批删除的文件数，以及两批之间的停顿（秒），避免长时间占用磁盘
+GC_BATCH_SIZE = 200
+GC_BATCH_PAUSE = 0.05
+# 配图数量不少于 GC_SUSPICIOUS_MIN_FILES 且无引用的比例超过 GC_SUSPICIOUS_RATIO 时，
+# 多半是数据库与配图目录对不上（如换了数据库文件），自动清理不删除任何文件
+GC_SUSPICIOUS_RATIO = 0.5
+GC_SUSPICIOUS_MIN_FILES = 20
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _image_name(path):
+    """
+    配图在配图目录中的文件名（即内容哈希），用于与数据库中的引用比较。
+    数据库保存的是绝对路径，移动程序目录或在其他电脑上恢复备份后目录部分会变，文件名不变。
+    """
+    return os.path.normcase(os.path.basename(path.replace("\\", "/")))
+
+
+def _referenced(with_previews):
+    """
+    返回 (引用的配图文件名集合, 仍然有效的预览缓存 key 集合, 不在配图目录中的引用数)。
+    预览缓存 key 需要读取每张配图的修改时间，with_previews 为 False 时不计算。
+    """
+    images_dir = _normalize(image_store.IMAGES_DIR)
+    names = set()
+    preview_keys = set()
+    outside = 0
+    for path in get_referenced_images():
+        names.add(_image_name(path))
+        if os.path.dirname(_normalize(path.replace("\\", "/"))) != images_dir:
+            outside += 1
+        if with_previews:
+            try:
+                preview_keys.add(image_store.preview_cache_key(path, os.stat(path).st_mtime_ns))
+            except OSError:
+                pass
+    return names, preview_keys, outside
+
+
+def _preview_dir():
+    return _normalize(os.path.join(image_store.IMAGES_DIR, image_store.PREVIEW_DIR_NAME))
+
+
+def _is_orphan(path, referenced, preview_keys):
+    name = os.path.basename(path)
+    if name.endswith(image_store.TEMP_SUFFIX):
+        # 中断的复制留下的临时文件
+        return True
+    if os.path.dirname(_normalize(path)) == _preview_dir():
+        return name.split("_", 1)[0] not in preview_keys
+    return _image_name(path) not in referenced
+
+
+def _is_image(path):
+    return (not os.path.basename(path).endswith(image_store.TEMP_SUFFIX)
+            and os.path.dirname(_normalize(path)) != _preview_dir())
+
+
+def scan_orphans(grace_seconds=GC_GRACE_SECONDS):
+    """
+    找出可以清理的文件，返回结果字典:
+    orphans（[(路径, 字节数)]）、reclaimable_bytes（可释放的字节数）、scanned（检查的文件数）、
+    warning（扫描结果看起来不可信时的原因说明，否则为 None）。
+
+    包括无引用的配图、原图已删除或已修改的预览缓存，以及中断的复制留下的临时文件。
+    配图按文件名与数据库中的引用比较，不比较目录。修改时间在 grace_seconds 之内的文件一律跳过。
+    """
+    images_dir = image_store.IMAGES_DIR
+    deadline = time.time() - grace_seconds
+    candidates = []
+    scanned = 0
+    image_count = 0
+    for directory in (images_dir, os.path.join(images_dir, image_store.PREVIEW_DIR_NAME)):
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            scanned += 1
+            image_count += _is_image(entry.path)
+            stat = entry.stat()
+            if stat.st_mtime < deadline:
+                candidates.append((entry.path, stat.st_size))
+
+    with_previews = any(os.path.dirname(_normalize(path)) == _preview_dir() for path, _ in candidates)
+    referenced, preview_keys, outside = _referenced(with_previews)
+    orphans = [(path, size) for path, size in candidates if _is_orphan(path, referenced, preview_keys)]
+
+    warning = None
+    orphan_images = sum(1 for path, _ in orphans if _is_image(path))
+    if outside:
+        warning = f"有 {outside} 个错题配图的路径不在配图目录 {images_dir} 中"
+    elif image_count >= GC_SUSPICIOUS_MIN_FILES and orphan_images > image_count * GC_SUSPICIOUS_RATIO:
+        warning = f"{image_count} 个配图中有 {orphan_images} 个没有被任何错题使用"
+    return {"orphans": orphans, "reclaimable_bytes": sum(size for _, size in orphans), "scanned": scanned,
+            "warning": warning}
+
+
+def collect_orphans(orphans, grace_seconds=GC_GRACE_SECONDS, batch_size=GC_BATCH_SIZE,
+                    pause=GC_BATCH_PAUSE, progress=None):
+    """
+    分批删除 scan_orphans() 找到的文件，返回结果字典:
+    removed（删除的文件数）、freed_bytes（释放的字节数）、skipped（删除前重新检查后保留的文件数）。
+
+    每批删除前重新检查这些文件的引用和修改时间，扫描之后被新保存的错题引用或重新上传的图片会被保留。
+    引用的文件名只在数据库有写入后才重新读取。
+    progress(done, total) 在每批之后调用，返回 False 时停止。
+    """
+    result = {"removed": 0, "freed_bytes": 0, "skipped": 0}
+    total = len(orphans)
+    generation = None
+    for start in range(0, total, batch_size):
+        if start and pause:
+            time.sleep(pause)
+        if get_data_generation() != generation:
+            generation = get_data_generation()
+            referenced = {_image_name(path) for path in get_referenced_images()}
+        deadline = time.time() - grace_seconds
+        for path, _ in orphans[start:start + batch_size]:
+            # 检查和删除之间不能有上传命中这个文件（见 image_store.store_lock）
+            with image_store.store_lock:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime >= deadline or _image_name(path) in referenced:
+                    result["skipped"] += 1
+                    continue
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"删除图片文件失败: {e}")
+                    continue
+            result["removed"] += 1
+            result["freed_bytes"] += stat.st_size
+        if progress is not None and progress(min(start + batch_size, total), total) is False:
+            break
+    return result
+
+
+def collect_garbage(grace_seconds=GC_GRACE_SECONDS, progress=None):
+    """
+    扫描并清理，返回 collect_orphans() 的结果，另附 reclaimable_bytes（扫描时可释放的字节数）
+    和 refused（扫描结果不可信、未删除任何文件时为 scan_orphans() 给出的原因，否则为 None）。
+    用于无人值守的自动清理，扫描结果有疑问时宁可不删。
+    """
+    scan = scan_orphans(grace_seconds)
+    if scan["warning"]:
+        result = {"removed": 0, "freed_bytes": 0, "skipped": len(scan["orphans"])}
+    else:
+        result = collect_orphans(scan["orphans"], grace_seconds, progress=progress)
+    result["reclaimable_bytes"] = scan["reclaimable_bytes"]
+    result["refused"] = scan["warning"]
+    return result
@@ -0,0 +1,106 @@
+# app/logic/image_store.py
+# 按内容寻址的错题配图存储：文件名即内容的 SHA-256，相同图片只保存一份。
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from app.data.database import count_image_references
+
+# 配图目录 - 使用绝对路径
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "assets", "images")
+# 复制时每次读写的块大小，图片不会整体读入内存
+CHUNK_SIZE = 1024 * 1024
+# 复制过程中的临时文件后缀
+TEMP_SUFFIX = ".tmp"
+# 配图目录下存放缩小预览图缓存的子目录，其中的文件不是配图本身
+PREVIEW_DIR_NAME = "previews"
+# 修改时间在这段时间之内的配图即使没有引用也不删除：上传时命中已有图片只会刷新它的修改时间，
+# 引用它的错题要到保存时才写入数据库。ImageStore.release() 和 app.logic.image_gc 共用
+UNREFERENCED_GRACE_SECONDS = 24 * 3600
+# put 命中已有文件时刷新修改时间，与删除前的检查和删除互斥；
+# 否则检查之后、删除之前被复用的图片仍会被删掉
+store_lock = threading.Lock()
+
+
+def preview_cache_key(path, mtime_ns):
+    """
+    预览缓存文件名的前缀，缓存文件名为 <key>_<宽度>.png|jpg。原图修改后 key 随之变化。
+    """
+    return hashlib.sha1(f"{os.path.abspath(path)}:{mtime_ns}".encode('utf-8')).hexdigest()
+
+
+class ImageStore:
+    """
+    配图存储。
+
+    put() 分块复制并同时计算哈希，以哈希命名文件，重复上传同一张图片时直接复用已有文件；
+    图片被哪些错题使用由数据库中的 question_image 记录（带索引），不另外保存引用计数；
+    release() 只在没有任何错题引用、且最近没有被上传过时才删除文件。
+    """
+
+    def __init__(self, images_dir=IMAGES_DIR):
+        self.images_dir = images_dir
+
+    def put(self, src_path):
+        """
+        将图片存入仓库，返回仓库中文件的绝对路径。
+        """
+        with open(src_path, 'rb') as f_in:
+            return self.put_stream(f_in, os.path.splitext(src_path)[1])
+
+    def put_stream(self, f_in, ext):
+        """
+        从已打开的二进制文件（如压缩包中的条目）读取图片存入仓库，ext 为扩展名（含点）。
+        """
+        os.makedirs(self.images_dir, exist_ok=True)
+        ext = ext.lower()
+        temp_path = os.path.join(self.images_dir, f".{uuid.uuid4().hex}{TEMP_SUFFIX}")
+        digest = hashlib.sha256()
+        try:
+            with open(temp_path, 'wb') as f_out:
+                while True:
+                    chunk = f_in.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f_out.write(chunk)
+            dest_path = os.path.abspath(os.path.join(self.images_dir, f"{digest.hexdigest()}{ext}"))
+            with store_lock:
+                if os.path.exists(dest_path):
+                    # 相同内容已存在，丢弃本次副本；更新修改时间，
+                    # 保存前这张图片不会被当作无引用的旧文件删除（见 release() 和 app.logic.image_gc）
+                    os.remove(temp_path)
+                    os.utime(dest_path)
+                else:
+                    os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return dest_path.replace("\\", "/")
+
+    def reference_count(self, path):
+        """
+        返回引用该图片的错题数量。
+        """
+        return count_image_references(path)
+
+    def release(self, path, grace_seconds=UNREFERENCED_GRACE_SECONDS):
+        """
+        在没有错题引用该图片时删除文件，返回是否已删除。
+        修改时间在 grace_seconds 之内的文件保留，它可能刚被另一道尚未保存的错题上传，
+        之后由 app.logic.image_gc 清理。
+        """
+        if not path:
+            return False
+        with store_lock:
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                return False
+            if mtime >= time.time() - grace_seconds or self.reference_count(path) > 0:
+                return False
+            os.remove(path)
+        return True
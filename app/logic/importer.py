@@ -0,0 +1,222 @@
+# app/logic/importer.py
+# 批量导入错题：读取 CSV/JSON 数据文件和图片文件夹或 zip 压缩包，
+# 校验每一行，在线程池中复制并计算图片哈希，再分批用 executemany 写入数据库。
+import csv
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from app.data.database import add_mistakes, get_import_job, save_import_progress, transaction
+from app.logic.image_store import ImageStore
+
+# 每批写入的行数，每批连同导入进度在一个事务中提交；为 0 时全部数据在一个事务中写入
+IMPORT_BATCH_SIZE = 5000
+# 复制图片的线程数
+IMAGE_WORKERS = min(8, (os.cpu_count() or 2) * 2)
+
+REQUIRED_FIELDS = ("subject", "grade", "semester", "question_desc")
+TEXT_FIELDS = ("subject", "grade", "semester", "question_desc", "correct_answer", "mistake_reason")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class MistakeImportError(Exception):
+    """
+    导入无法进行（数据文件无法读取、格式错误或已导入过）。
+    """
+
+
+def read_records(data_path):
+    """
+    读取数据文件，返回字典列表。支持 .csv（UTF-8，可带 BOM）、.json（数组或 {"mistakes": [...]}）
+    和 .jsonl（每行一个对象）。
+    """
+    ext = os.path.splitext(data_path)[1].lower()
+    try:
+        with open(data_path, "r", encoding="utf-8-sig", newline="") as f:
+            if ext == ".csv":
+                return list(csv.DictReader(f))
+            if ext == ".jsonl":
+                return [json.loads(line) for line in f if line.strip()]
+            if ext == ".json":
+                data = json.load(f)
+                if isinstance(data, dict):
+                    data = data.get("mistakes")
+                if not isinstance(data, list):
+                    raise MistakeImportError("JSON 文件应为错题数组或包含 mistakes 数组的对象")
+                return data
+    except (OSError, UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise MistakeImportError(f"读取数据文件失败: {e}") from e
+    raise MistakeImportError(f"不支持的数据文件格式: {ext or data_path}")
+
+
+def source_key(data_path):
+    """
+    按数据文件内容计算导入任务的标识，同一文件再次导入时据此继续或识别为已导入。
+    """
+    digest = hashlib.sha256()
+    with open(data_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _ImageSource:
+    """
+    图片来源：文件夹或 zip 压缩包；未指定时数据中的图片路径按数据文件所在目录解析。
+    zip 的读取句柄不在线程间共享，每个线程各自打开一次。
+    """
+
+    def __init__(self, images_path, base_dir):
+        self.images_path = images_path
+        self.base_dir = base_dir
+        self.is_zip = bool(images_path) and zipfile.is_zipfile(images_path)
+        self._local = threading.local()
+        self._zip_handles = []
+        self._lock = threading.Lock()
+        self._names = None
+        if self.is_zip:
+            with zipfile.ZipFile(images_path) as archive:
+                self._names = {name.replace("\\", "/") for name in archive.namelist()}
+
+    def _root(self):
+        return self.images_path or self.base_dir
+
+    def exists(self, name):
+        if self.is_zip:
+            return name.replace("\\", "/") in self._names
+        return os.path.isfile(os.path.join(self._root(), name))
+
+    def open(self, name):
+        if not self.is_zip:
+            return open(os.path.join(self._root(), name), "rb")
+        archive = getattr(self._local, "archive", None)
+        if archive is None:
+            archive = self._local.archive = zipfile.ZipFile(self.images_path)
+            with self._lock:
+                self._zip_handles.append(archive)
+        return archive.open(name.replace("\\", "/"))
+
+    def close(self):
+        with self._lock:
+            for archive in self._zip_handles:
+                archive.close()
+            self._zip_handles = []
+
+
+def validate_record(record, images):
+    """
+    校验并规范化一行数据，返回 (data, error)，error 为 None 表示通过。
+    """
+    if not isinstance(record, dict):
+        return None, "不是有效的对象"
+    data = {field: str(record.get(field) or "").strip() for field in TEXT_FIELDS}
+    missing = [field for field in REQUIRED_FIELDS if not data[field]]
+    if missing:
+        return None, f"缺少必填字段: {', '.join(missing)}"
+
+    record_date = str(record.get("record_date") or "").strip()
+    if record_date:
+        try:
+            record_date = datetime.strptime(record_date, "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            return None, f"录入日期格式应为 YYYY-MM-DD: {record_date}"
+    data["record_date"] = record_date or date.today().isoformat()
+
+    image = str(record.get("question_image") or "").strip()
+    if image:
+        if os.path.splitext(image)[1].lower() not in IMAGE_EXTENSIONS:
+            return None, f"不支持的图片格式: {image}"
+        if not images.exists(image):
+            return None, f"找不到图片: {image}"
+    data["question_image"] = image or None
+    return data, None
+
+
+def import_mistakes(data_path, images_path=None, batch_size=IMPORT_BATCH_SIZE, workers=IMAGE_WORKERS,
+                    progress=None, force=False, image_store=None):
+    """
+    导入错题，返回结果字典:
+    imported（新写入的条数）、errors（[(行号, 原因)]，行号从 1 开始）、
+    resumed_from（从第几行之后继续）、total（总行数）、cancelled（是否被取消）。
+
+    每批数据和导入进度在同一事务中提交；中途失败或取消后对同一文件再次导入会从中断处继续。
+    已完整导入过的文件会抛出 MistakeImportError，force 为 True 时重新导入。
+    progress(done, total) 在每批提交后调用，返回 False 时在当前批次之后停止。
+    导入时不预渲染 LaTeX（页面会在浏览器端渲染），可之后运行
+    python -m app.utils.katex_prerender 批量补全。
+    """
+    records = read_records(data_path)
+    total = len(records)
+    key = source_key(data_path)
+    name = os.path.basename(data_path)
+
+    job = get_import_job(key)
+    start = 0
+    if job is not None and not force:
+        if job["finished"]:
+            raise MistakeImportError(f"{name} 已导入过（{job['updated_at']}）")
+        start = job["rows_done"]
+
+    images = _ImageSource(images_path, os.path.dirname(os.path.abspath(data_path)))
+    image_store = image_store or ImageStore()
+    # 同一导入中重复引用的图片只复制一次
+    stored_images = {}
+    result = {"imported": 0, "errors": [], "resumed_from": start, "total": total, "cancelled": False}
+    batch_size = batch_size or max(total - start, 1)
+
+    def store_image(image_name):
+        with images.open(image_name) as f:
+            return image_store.put_stream(f, os.path.splitext(image_name)[1])
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for batch_start in range(start, total, batch_size):
+                batch_end = min(batch_start + batch_size, total)
+                valid = []
+                for row_number in range(batch_start + 1, batch_end + 1):
+                    data, error = validate_record(records[row_number - 1], images)
+                    if error:
+                        result["errors"].append((row_number, error))
+                    else:
+                        valid.append((row_number, data))
+
+                # 在线程池中复制并计算图片哈希
+                pending = {image for _, data in valid
+                           if (image := data["question_image"]) and image not in stored_images}
+                futures = {image: executor.submit(store_image, image) for image in pending}
+                for image, future in futures.items():
+                    try:
+                        stored_images[image] = future.result()
+                    except OSError as e:
+                        stored_images[image] = e
+
+                rows = []
+                for row_number, data in valid:
+                    image = data["question_image"]
+                    if image:
+                        stored = stored_images[image]
+                        if isinstance(stored, OSError):
+                            result["errors"].append((row_number, f"复制图片失败: {stored}"))
+                            continue
+                        data["question_image"] = stored
+                    rows.append(data)
+
+                with transaction():
+                    add_mistakes(rows, prerender=False)
+                    save_import_progress(key, name, batch_end, total, finished=batch_end >= total)
+                result["imported"] += len(rows)
+
+                if progress is not None and progress(batch_end, total) is False:
+                    result["cancelled"] = batch_end < total
+                    break
+            else:
+                if start >= total:
+                    save_import_progress(key, name, total, total, finished=True)
+    finally:
+        images.close()
+    result["errors"].sort()
+    return result
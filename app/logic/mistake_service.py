@@ -1,102 +1,135 @@
 # app/logic/mistake_service.py
 
+import functools
 import os
-import uuid
-from PySide6.QtWebEngineCore import QWebEngineSettings
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtCore import QEventLoop, QTimer
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-from app.data.database import get_mistake_by_id, delete_mistake as db_delete_mistake
-from app.utils.renderer import render_html_with_katex
+from app.data.database import get_mistakes_by_ids, delete_mistakes as db_delete_mistakes
+from app.logic.image_store import ImageStore
+from app.utils import tracing
+from app.utils.renderer import render_body_fragment, assemble_document, IMAGE_SIZE_PRINT
+
+# 导出页面在预览样式之上的调整
+_EXPORT_STYLE = """
+        <style>
+            body { background-color: #ffffff; margin: 2em; }
+            .mistake-container { page-break-inside: avoid; border: 1px solid #ccc; margin-bottom: 20px; padding: 20px; }
+            .container { max-width: none; box-shadow: none; padding: 0; }
+        </style>
+"""
 
 class MistakeService:
     def __init__(self):
-        pass
+        self.image_store = ImageStore()
+        self._export_pool = None
+        # 删除图片文件的后台线程，单线程即可，避免在界面线程上做文件操作
+        self._cleanup_executor = None
 
     def delete_mistake_with_assets(self, mistake_id):
         """
-        删除错题记录及其关联的图片文件。
+        删除错题记录；关联的图片文件不再被其他错题使用时在后台一并删除。
         """
-        mistake_to_delete = get_mistake_by_id(mistake_id)
-        if not mistake_to_delete:
+        if not self.delete_mistakes_with_assets([mistake_id]):
             raise ValueError("找不到指定的错题记录")
 
-        image_path = mistake_to_delete['question_image']
-        db_delete_mistake(mistake_id)
+    def delete_mistakes_with_assets(self, mistake_ids):
+        """
+        在一个事务中删除多条错题记录，返回删除的条数。
+        关联的图片文件在后台线程中检查，不再被其他错题使用时删除。
+        """
+        deleted, images = db_delete_mistakes(mistake_ids)
+        if images:
+            self.release_images_async(images)
+        return deleted
 
-        if image_path and os.path.exists(image_path):
+    def release_images_async(self, paths):
+        """
+        在后台线程中释放图片（见 ImageStore.release），返回 Future，结果为删除的文件数。
+        """
+        if self._cleanup_executor is None:
+            self._cleanup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-cleanup")
+        return self._cleanup_executor.submit(self._release_images, list(paths))
+
+    def _release_images(self, paths):
+        removed = 0
+        for path in paths:
             try:
-                os.remove(image_path)
+                removed += self.image_store.release(path)
             except OSError as e:
                 print(f"删除图片文件失败: {e}")
+        return removed
 
-    def export_to_pdf(self, mistakes_list, filepath):
+    @tracing.traced("export.total")
+    def export_to_pdf(self, mistake_ids, filepath, chunk_size=None, progress=None,
+                      page_count=None, cancelled=None):
         """
-        将错题列表导出为包含KaTeX渲染的PDF文件。
+        将错题按 ID 顺序导出为包含KaTeX渲染的PDF文件。
+
+        错题按 chunk_size 分批读取、渲染并打印为分片 PDF，分片分配给 page_count 个
+        离屏页面并行打印，最后按原顺序合并为目标文件，内存占用只与分片大小和页面数有关。
+        chunk_size、page_count 默认取 pdf_exporter 中的 EXPORT_CHUNK_SIZE、EXPORT_PAGE_COUNT。
+        未安装 pypdf 时退回一次性整批导出。
+        progress(done, total) 在每个分片完成后调用，返回 False 时取消导出并抛出
+        PdfExportCancelled；其他失败抛出 PdfExportError。目标文件只在全部成功后写入。
+        cancelled() 返回 True 时同样取消导出，分片打印过程中也会检查（见 PdfExportPool.run）。
         """
-        # 获取 assets/katex 目录的绝对路径
-        assets_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'katex')).replace('\\', '/')
-        
-        # 组合所有错题的HTML
-        full_html = "<html><head>"
-        # KaTeX 和 样式的头部只需要一次
-        full_html += f"""
-        <meta charset="UTF-8">
-        <link rel="stylesheet" href="file:///{assets_path}/katex.min.css">
-        <script src="file:///{assets_path}/katex.min.js"></script>
-        <script src="file:///{assets_path}/auto-render.min.js"></script>
-        <style>
-            body {{ font-family: sans-serif; margin: 2em; }}
-            .mistake-container {{ page-break-inside: avoid; border: 1px solid #ccc; margin-bottom: 20px; padding: 20px; }}
-            img {{ max-width: 100%; }}
-        </style>
+        # 导出时才导入 WebEngine，主窗口启动时不加载
+        from app.logic.pdf_exporter import (PdfExportError, EXPORT_CHUNK_SIZE, EXPORT_PAGE_COUNT,
+                                            can_merge_pdfs, merge_pdfs)
+        chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+        page_count = page_count or EXPORT_PAGE_COUNT
+        mistake_ids = list(mistake_ids)
+        total = len(mistake_ids)
+        if not total:
+            raise PdfExportError("没有可导出的错题")
+        if not can_merge_pdfs():
+            chunk_size = total
+        chunks = [mistake_ids[i:i + chunk_size] for i in range(0, total, chunk_size)]
+
+        output_dir = os.path.dirname(os.path.abspath(filepath))
+        with tempfile.TemporaryDirectory(prefix="folio-export-", dir=output_dir) as work_dir:
+            part_paths = [os.path.join(work_dir, f"part-{index:05d}.pdf") for index in range(len(chunks))]
+            jobs = [(functools.partial(self._build_chunk_html, chunk), part_path)
+                    for chunk, part_path in zip(chunks, part_paths)]
+            done = [0]
+
+            def on_job_done(index):
+                done[0] += len(chunks[index])
+                if progress is not None:
+                    return progress(done[0], total)
+                return True
+
+            with tracing.span("export.render_print", items=total, chunks=len(chunks), pages=page_count):
+                self._get_export_pool(page_count).run(jobs, on_job_done, cancelled)
+
+            merged_path = part_paths[0]
+            if len(part_paths) > 1:
+                merged_path = os.path.join(work_dir, "merged.pdf")
+                with tracing.span("export.merge", parts=len(part_paths)):
+                    merge_pdfs(part_paths, merged_path)
+            os.replace(merged_path, filepath)
+
+    def _build_chunk_html(self, chunk_ids):
+        return self._build_export_html(get_mistakes_by_ids(chunk_ids))
+
+    def _build_export_html(self, mistakes_list):
         """
-        full_html += "</head><body>"
-
-        for mistake in mistakes_list:
-            # 复用渲染逻辑，但只取其body内容
-            html_content = render_html_with_katex(mistake, show_answer=True)
-            # 简单地提取body内容
-            if '<body>' in html_content and '</body>' in html_content:
-                body_part = html_content.split('<body>', 1)
-                body_content = body_part.split('</body>', 1)
-                full_html += f'<div class="mistake-container">{body_content}</div>'
-
-        full_html += """
-        <script>
-            document.addEventListener("DOMContentLoaded", function() {
-                renderMathInElement(document.body, {
-                    delimiters: [
-                        {left: "$$", right: "$$", display: true},
-                        {left: "$", right: "$", display: false},
-                        {left: "\\\\[", right: "\\\\]", display: true},
-                        {left: "\\\\(", right: "\\\\)", display: false}
-                    ]
-                });
-            });
-        </script>
-        </body></html>
+        组合一批错题的导出页面：KaTeX 头部只输出一次，各题只渲染内容片段。
+        返回按顺序产出页面各部分的迭代器。
         """
+        from app.logic.pdf_exporter import MATH_READY_SCRIPT
+        fragments = (f'<div class="mistake-container">'
+                     f'{render_body_fragment(dict(mistake), show_answer=True, image_size=IMAGE_SIZE_PRINT)}</div>'
+                     for mistake in mistakes_list)
+        # 页面从临时文件加载，KaTeX 资源以 file:// 引用；公式渲染完成后由页面通知导出器开始打印
+        return assemble_document(fragments, extra_style=_EXPORT_STYLE, tail=MATH_READY_SCRIPT, link_assets=True)
 
-        # 使用QWebEngineView来打印HTML到PDF
-        # 注意: 这需要在Qt应用环境中运行
-        view = QWebEngineView()
-        view.settings().setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
-        view.settings().setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
-
-        # 使用事件循环等待页面加载和渲染完成
-        loop = QEventLoop()
-        
-        def on_load_finished(success):
-            if success:
-                # 给JS渲染留出一点时间
-                QTimer.singleShot(2000, lambda: view.printToPdf(filepath))
-                QTimer.singleShot(3000, loop.quit) # 等待打印命令发出后退出
-            else:
-                print("PDF导出失败：页面加载失败")
-                loop.quit()
-
-        view.loadFinished.connect(on_load_finished)
-        view.setHtml(full_html)
-        
-        loop.exec()
\ No newline at end of file
+    def _get_export_pool(self, page_count):
+        # 导出池持有离屏页面，首次导出时再创建；页面数变化时重建
+        from app.logic.pdf_exporter import PdfExportPool
+        if self._export_pool is None or self._export_pool.page_count != page_count:
+            if self._export_pool is not None:
+                self._export_pool.deleteLater()
+            self._export_pool = PdfExportPool(page_count)
+        return self._export_pool
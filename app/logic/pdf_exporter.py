@@ -0,0 +1,388 @@
+# app/logic/pdf_exporter.py
+# 由完成事件驱动的 PDF 打印：页面中的 KaTeX 渲染完成后由 JS 通知 Python，
+# 再调用 printToPdf 并等待 pdfPrintingFinished，不再依赖固定的等待时间。
+# 大批量导出时由 PdfExportPool 在多个离屏页面上并行打印分片。
+import functools
+import gc
+import os
+import tempfile
+
+from PySide6.QtCore import QEventLoop, QObject, QTimer, QUrl, Signal
+from PySide6.QtWebEngineCore import QWebEngineLoadingInfo, QWebEnginePage, QWebEngineSettings
+
+from app.utils import tracing
+from app.utils.image_scheme import install_image_scheme_handler
+from app.utils.renderer import KATEX_RENDER_OPTIONS
+
+# 单次打印的总超时时间（毫秒），包括页面加载、公式渲染和写入 PDF
+EXPORT_TIMEOUT_MS = 120000
+# 分批导出时每个分片包含的错题数量
+EXPORT_CHUNK_SIZE = 50
+# 并行打印分片的离屏页面数量
+EXPORT_PAGE_COUNT = max(1, min(4, (os.cpu_count() or 2) // 2))
+
+# JS 通过修改 document.title 通知渲染结果
+MATH_READY_TITLE = "folio:math-rendered"
+MATH_ERROR_PREFIX = "folio:math-error:"
+
+# 放在导出页面末尾：图片等资源加载完成（window load）后渲染公式，再发出通知。
+# 离屏页面没有视图，requestAnimationFrame 不会触发，这里用 setTimeout 推迟到当前任务之后；
+# printToPdf 会自行完成排版
+MATH_READY_SCRIPT = """
+        <script>
+            window.addEventListener('load', function() {
+                try {
+                    renderMathInElement(document.body, """ + KATEX_RENDER_OPTIONS + """);
+                } catch (e) {
+                    document.title = '""" + MATH_ERROR_PREFIX + """' + (e && e.message ? e.message : e);
+                    return;
+                }
+                setTimeout(function() {
+                    document.title = '""" + MATH_READY_TITLE + """';
+                }, 0);
+            });
+        </script>
+"""
+
+
+class PdfExportError(Exception):
+    """
+    PDF 导出失败（页面加载失败、公式渲染出错、写入失败或超时）。
+    """
+
+
+class PdfExportCancelled(PdfExportError):
+    """
+    用户取消了导出。
+    """
+
+
+def can_merge_pdfs():
+    """
+    是否可以合并分片 PDF（需要安装 pypdf）。
+    """
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def merge_pdfs(part_paths, output_path):
+    """
+    按顺序合并多个 PDF 文件到 output_path。
+
+    分片逐个读取：页面及其引用的对象（内容流、字体、图片、注释等）重新编号后立即写入目标文件，
+    最后写出一个包含全部页面的页面树和交叉引用表。同时读入内存的只有一个分片，
+    合并的峰值内存只与分片大小有关，与导出的总页数无关。原文件的目录、大纲等文档级信息不保留。
+    """
+    from pypdf import PdfReader
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject
+
+    # offsets[i] 为 i 号对象在文件中的位置，0 号对象按规范保留；1 号为页面树根节点，最后写出
+    offsets = [None, None]
+    pages_ref = IndirectObject(1, 0, None)
+    kids = ArrayObject()
+
+    def allocate():
+        offsets.append(None)
+        return len(offsets) - 1
+
+    with open(output_path, 'wb') as out:
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        def write_object(number, obj):
+            offsets[number] = out.tell()
+            out.write(f"{number} 0 obj\n".encode())
+            obj.write_to_stream(out)
+            out.write(b"\nendobj\n")
+
+        for path in part_paths:
+            reader = PdfReader(path)
+            # 分片中的对象号 -> 目标文件中的对象号，以及已分配号码、尚未写出的对象
+            numbers = {}
+            pending = []
+
+            def renumber(obj):
+                if isinstance(obj, IndirectObject):
+                    number = numbers.get(obj.idnum)
+                    if number is None:
+                        number = numbers[obj.idnum] = allocate()
+                        pending.append((number, obj))
+                    return IndirectObject(number, 0, None)
+                if isinstance(obj, StreamObject):
+                    copy = obj.__class__()
+                    # 流数据保持原来的编码直接写出
+                    copy._data = obj._data
+                    copy.update({key: renumber(value) for key, value in obj.items()})
+                    return copy
+                if isinstance(obj, DictionaryObject):
+                    return DictionaryObject({key: renumber(value) for key, value in obj.items()})
+                if isinstance(obj, ArrayObject):
+                    return ArrayObject(renumber(value) for value in obj)
+                return obj
+
+            # 先为所有页面分配号码，链接注释等对页面的引用指向合并后的页面
+            pages = list(reader.pages)
+            for page in pages:
+                number = numbers[page.indirect_reference.idnum] = allocate()
+                kids.append(IndirectObject(number, 0, None))
+            for page in pages:
+                # 可继承的属性（页面尺寸、资源）已由 pypdf 补到每个页面上，不再引用原来的页面树
+                copy = DictionaryObject({key: renumber(value) for key, value in page.items() if key != "/Parent"})
+                copy[NameObject("/Parent")] = pages_ref
+                write_object(numbers[page.indirect_reference.idnum], copy)
+                while pending:
+                    number, ref = pending.pop()
+                    write_object(number, renumber(ref.get_object()))
+            # pypdf 读出的对象与 reader 互相引用，要等循环垃圾回收才会释放，每个分片之后主动回收
+            del reader, pages
+            gc.collect()
+
+        write_object(1, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): kids,
+            NameObject("/Count"): NumberObject(len(kids)),
+        }))
+        catalog = allocate()
+        write_object(catalog, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): pages_ref,
+        }))
+
+        xref_offset = out.tell()
+        out.write(f"xref\n0 {len(offsets)}\n0000000000 65535 f \n".encode())
+        for offset in offsets[1:]:
+            out.write(f"{offset:010d} 00000 n \n".encode())
+        out.write(f"trailer\n<< /Size {len(offsets)} /Root {catalog} 0 R >>\n"
+                  f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+class PdfExporter(QObject):
+    """
+    使用离屏 QWebEnginePage 将 HTML 打印为 PDF。
+
+    页面须包含 MATH_READY_SCRIPT；收到“公式已渲染”通知后才开始打印，
+    打印完成或失败后发出 finished 信号（成功时错误信息为空字符串）。
+    同一页面连续执行多个任务时，只处理当前任务页面地址的加载结果，被新任务打断的上一次加载不影响当前任务。
+    cancel_check 不为空时，在页面加载完成和公式渲染完成时调用，返回 True 则放弃当前任务并以 CANCELLED_MESSAGE 结束。
+    """
+
+    CANCELLED_MESSAGE = "导出已取消"
+
+    finished = Signal(str)
+
+    def __init__(self, parent=None, timeout_ms=EXPORT_TIMEOUT_MS, profile=None):
+        super().__init__(parent)
+        self.timeout_ms = timeout_ms
+        self.page = QWebEnginePage(profile, self) if profile is not None else QWebEnginePage(self)
+        settings = self.page.settings()
+        settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
+        # 导出页面从 file:// 加载，folio-img 配图对它来说属于远程地址，默认会被拦截
+        settings.setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
+        settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
+        install_image_scheme_handler(self.page.profile())
+        self.page.loadingChanged.connect(self._on_loading_changed)
+        self.page.titleChanged.connect(self._on_title_changed)
+        self.page.pdfPrintingFinished.connect(self._on_pdf_finished)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(lambda: self._finish(f"导出超时（超过 {self.timeout_ms // 1000} 秒）"))
+        self._busy = False
+        self._filepath = None
+        self._html_path = None
+        self._url = None
+        self._phase_span = tracing.NULL_SPAN
+        # 导出池中当前任务的序号
+        self.current_job = None
+        self.cancel_check = None
+
+    @property
+    def busy(self):
+        return self._busy
+
+    def start(self, html, filepath):
+        """
+        开始将完整的 HTML 页面打印到 filepath，结果通过 finished 信号返回。
+        html 可以是字符串，也可以是按顺序产出页面各部分的可迭代对象（见 assemble_document），
+        后者边生成边写入临时文件。
+        """
+        if self._busy:
+            raise PdfExportError("导出页面正忙")
+        # 通过临时文件加载，避免 setHtml 的 2 MB 限制，并允许页面引用 file:// 资源
+        fd, self._html_path = tempfile.mkstemp(suffix=".html", prefix="folio-export-")
+        try:
+            with tracing.span("export.write_html") as write_span:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.writelines((html,) if isinstance(html, str) else html)
+                    write_span.args["bytes"] = f.tell()
+        except BaseException:
+            os.remove(self._html_path)
+            self._html_path = None
+            raise
+        self._busy = True
+        self._filepath = filepath
+        self._timer.start(self.timeout_ms)
+        self._phase_span = tracing.span("export.load_render")
+        self._url = QUrl.fromLocalFile(self._html_path)
+        self.page.load(self._url)
+
+    def abort(self):
+        """
+        放弃当前的打印任务，不发出 finished 信号。
+        """
+        if self._busy:
+            self._reset()
+            self.page.triggerAction(QWebEnginePage.WebAction.Stop)
+
+    def clear(self):
+        """
+        页面空闲时清空内容，释放上一次导出占用的 DOM 和图片。
+        """
+        if not self._busy:
+            self.page.setUrl(QUrl("about:blank"))
+
+    def _reset(self):
+        self._timer.stop()
+        self._busy = False
+        if self._html_path is not None:
+            try:
+                os.remove(self._html_path)
+            except OSError:
+                pass
+            self._html_path = None
+
+    def _finish(self, error=None):
+        if not self._busy:
+            return
+        self._phase_span.finish(error=error or "")
+        self._reset()
+        self.finished.emit(error or "")
+
+    def _cancelled(self):
+        if self.cancel_check is not None and self.cancel_check():
+            self._finish(self.CANCELLED_MESSAGE)
+            return True
+        return False
+
+    def _on_loading_changed(self, info):
+        # 忽略其他地址（上一个任务、空白页）的加载结果
+        if not self._busy or info.url() != self._url:
+            return
+        status = info.status()
+        if status in (QWebEngineLoadingInfo.LoadStatus.LoadFailedStatus,
+                      QWebEngineLoadingInfo.LoadStatus.LoadStoppedStatus):
+            self._finish(f"页面加载失败: {info.errorString()}")
+        elif status == QWebEngineLoadingInfo.LoadStatus.LoadSucceededStatus:
+            self._cancelled()
+
+    def _on_title_changed(self, title):
+        if not self._busy or self.page.url() != self._url or self._cancelled():
+            return
+        if title == MATH_READY_TITLE:
+            self._phase_span.finish()
+            self._phase_span = tracing.span("export.print")
+            self.page.printToPdf(self._filepath)
+        elif title.startswith(MATH_ERROR_PREFIX):
+            self._finish(f"公式渲染失败: {title[len(MATH_ERROR_PREFIX):]}")
+
+    def _on_pdf_finished(self, file_path, success):
+        # 忽略已放弃任务迟到的打印结果
+        if not self._busy or file_path != self._filepath:
+            return
+        self._finish(None if success else f"写入PDF失败: {file_path}")
+
+
+class PdfExportPool(QObject):
+    """
+    由多个离屏页面组成的导出池，同时打印多个分片，让多个 Chromium 渲染进程并行工作。
+
+    run() 接收 (build_html, filepath) 任务列表：空闲页面按顺序领取下一个任务，
+    领取时才调用 build_html() 生成页面，同时占用内存的分片数不超过页面数。
+    每个任务写入各自的文件，调用方按任务顺序合并即可保持原有顺序。
+    """
+
+    def __init__(self, page_count=EXPORT_PAGE_COUNT, parent=None, timeout_ms=EXPORT_TIMEOUT_MS):
+        super().__init__(parent)
+        self.page_count = max(1, page_count)
+        self.timeout_ms = timeout_ms
+        self._exporters = []
+
+    def _ensure_exporters(self, count):
+        # 页面按需创建，之后的导出继续复用
+        while len(self._exporters) < count:
+            self._exporters.append(PdfExporter(self, self.timeout_ms))
+        return self._exporters[:count]
+
+    def run(self, jobs, progress=None, cancelled=None):
+        """
+        执行全部任务，全部成功后返回。
+
+        progress(index) 在第 index 个任务完成时调用（完成顺序不一定是任务顺序），
+        返回 False 时取消剩余任务并抛出 PdfExportCancelled；任一任务失败时抛出 PdfExportError。
+        cancelled() 在各页面加载和渲染完成时调用，返回 True 时放弃正在打印的任务并抛出 PdfExportCancelled，
+        只有一个任务时也能中途取消。
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        exporters = self._ensure_exporters(min(self.page_count, len(jobs)))
+        loop = QEventLoop()
+        state = {"next": 0, "running": 0, "error": None}
+        connections = []
+
+        def stop(error):
+            if state["error"] is None:
+                state["error"] = error
+            for exporter in exporters:
+                exporter.abort()
+            state["running"] = 0
+            loop.quit()
+
+        def dispatch(exporter):
+            if state["error"] is not None or state["next"] >= len(jobs):
+                if state["running"] == 0:
+                    loop.quit()
+                return
+            index = state["next"]
+            state["next"] += 1
+            build_html, filepath = jobs[index]
+            exporter.current_job = index
+            state["running"] += 1
+            try:
+                exporter.start(build_html(), filepath)
+            except Exception as e:
+                state["running"] -= 1
+                stop(PdfExportError(str(e)))
+
+        def on_finished(exporter, error):
+            state["running"] -= 1
+            if cancelled is not None and cancelled():
+                stop(PdfExportCancelled("导出已取消"))
+                return
+            if error:
+                stop(PdfExportError(error))
+                return
+            if progress is not None and progress(exporter.current_job) is False:
+                stop(PdfExportCancelled("导出已取消"))
+                return
+            dispatch(exporter)
+
+        for exporter in exporters:
+            handler = functools.partial(on_finished, exporter)
+            exporter.finished.connect(handler)
+            exporter.cancel_check = cancelled
+            connections.append((exporter, handler))
+        try:
+            for exporter in exporters:
+                dispatch(exporter)
+            if state["running"] and state["error"] is None:
+                loop.exec()
+        finally:
+            for exporter, handler in connections:
+                exporter.finished.disconnect(handler)
+                exporter.cancel_check = None
+                exporter.abort()
+                exporter.clear()
+        if state["error"] is not None:
+            raise state["error"]
@@ -0,0 +1,69 @@
+# app/logic/review_sampler.py
+import random
+
+from app.data.database import (probe_random_ids, get_mistake_ids, get_mistakes_by_ids,
+                               get_data_generation)
+
+
+class ReviewSampler:
+    """
+    复习题目抽样器。
+
+    优先按 id 随机探测抽题（每题约一次主键查找，不扫描全部匹配行）；
+    探测不到足够的题目时（关键词检索、匹配行很稀疏或本轮剩余不多），
+    读取该筛选条件下的全部 id 抽样，读取结果按数据版本缓存。
+
+    :param seed: 随机种子；相同的种子和数据会抽出相同的题目，便于复现练习卷。
+    :param without_replacement: 为 True 时连续多次抽取不会重复，全部抽完后再开始新一轮。
+    """
+
+    def __init__(self, seed=None, without_replacement=True):
+        self.rng = random.Random(seed)
+        self.without_replacement = without_replacement
+        self._served = {}
+        self._id_cache = {}
+
+    @staticmethod
+    def _key(filters):
+        return tuple(sorted((k, v) for k, v in (filters or {}).items() if v))
+
+    def _all_ids(self, key, filters):
+        generation = get_data_generation()
+        cached = self._id_cache.get(key)
+        if cached is None or cached[0] != generation:
+            cached = self._id_cache[key] = (generation, get_mistake_ids(filters))
+        return cached[1]
+
+    def sample_ids(self, count, filters=None, exclude=()):
+        """
+        抽取最多 count 个错题 id，exclude 中的 id 不会被抽到。
+        """
+        key = self._key(filters)
+        served = self._served.setdefault(key, set()) if self.without_replacement else set()
+        exclude = set(exclude)
+
+        picked = probe_random_ids(count, filters, self.rng, served | exclude)
+        if len(picked) < count:
+            ids = self._all_ids(key, filters)
+            remaining = [i for i in ids if i not in served and i not in exclude]
+            if len(remaining) < count:
+                # 本轮剩余不足，开始新一轮
+                served.clear()
+                remaining = [i for i in ids if i not in exclude]
+            picked = self.rng.sample(remaining, min(count, len(remaining)))
+
+        served.update(picked)
+        return picked
+
+    def sample(self, count, filters=None, exclude=()):
+        """
+        抽取最多 count 道错题，返回完整的错题记录。
+        """
+        return get_mistakes_by_ids(self.sample_ids(count, filters, exclude))
+
+    def reset(self):
+        """
+        清空抽取记录和缓存，重新开始。
+        """
+        self._served.clear()
+        self._id_cache.clear()
@@ -0,0 +1,62 @@
+# app/logic/scheduler.py
+# 基于 SM-2 算法的间隔重复复习计划。
+from datetime import date, timedelta
+
+from app.data.database import get_mistake_by_id, update_review_schedule
+
+# 复习结果对应的 SM-2 评分 (0-5)
+QUALITY_FORGOT = 1   # 没掌握
+QUALITY_HARD = 3     # 有点模糊
+QUALITY_GOOD = 5     # 已掌握
+
+DEFAULT_EASE_FACTOR = 2.5
+MIN_EASE_FACTOR = 1.3
+
+
+def next_schedule(ease_factor, repetitions, interval_days, quality, today):
+    """
+    根据本次复习评分计算下一次复习计划。
+
+    :param quality: 0-5 的评分，低于 3 视为没有掌握，重新从头开始。
+    :param today: 本次复习日期 (date)。
+    :return: 包含 ease_factor、repetitions、interval_days、due_at 的字典。
+    """
+    ease_factor = ease_factor or DEFAULT_EASE_FACTOR
+    repetitions = repetitions or 0
+    interval_days = interval_days or 0
+
+    if quality < 3:
+        repetitions = 0
+        interval_days = 1
+    else:
+        if repetitions == 0:
+            interval_days = 1
+        elif repetitions == 1:
+            interval_days = 6
+        else:
+            interval_days = round(interval_days * ease_factor)
+        repetitions += 1
+
+    ease_factor += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    ease_factor = max(MIN_EASE_FACTOR, ease_factor)
+
+    return {
+        "ease_factor": ease_factor,
+        "repetitions": repetitions,
+        "interval_days": interval_days,
+        "due_at": (today + timedelta(days=interval_days)).isoformat(),
+    }
+
+
+def record_review(mistake_id, quality, today=None):
+    """
+    记录一道错题的复习结果并更新其复习计划，返回新的计划。
+    """
+    mistake = get_mistake_by_id(mistake_id)
+    if not mistake:
+        raise ValueError("找不到指定的错题记录")
+    today = today or date.today()
+    schedule = next_schedule(mistake['ease_factor'], mistake['repetitions'],
+                             mistake['interval_days'], quality, today)
+    update_review_schedule(mistake_id, schedule, today.isoformat())
+    return schedule
@@ -5,28 +5,28 @@ from PySide6.QtWidgets import (QDialog, QVBoxLayout, QFormLayout, QComboBox,
 from PySide6.QtGui import QPixmap
 from PySide6.QtCore import QThread, Signal, Qt, QSize
 from datetime import datetime
-import uuid
 import os
 
 from app.data.database import add_mistake, get_mistake_by_id, update_mistake
-
-# 定义资源目录 - 使用绝对路径
-ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "assets", "images")
+from app.logic.image_store import ImageStore
 
 class ImageCopyThread(QThread):
     copy_finished = Signal(str)
+    copy_failed = Signal(str)
 
-    def __init__(self, src_path, dest_path):
+    def __init__(self, src_path, image_store):
         super().__init__()
         self.src_path = src_path
-        self.dest_path = dest_path
+        self.image_store = image_store
 
     def run(self):
-        # Ensure the destination directory exists
-        os.makedirs(os.path.dirname(self.dest_path), exist_ok=True)
-        with open(self.src_path, 'rb') as f_in, open(self.dest_path, 'wb') as f_out:
-            f_out.write(f_in.read())
-        self.copy_finished.emit(self.dest_path)
+        # 分块复制并按内容哈希命名，重复的图片只保存一份
+        try:
+            dest_path = self.image_store.put(self.src_path)
+        except OSError as e:
+            self.copy_failed.emit(str(e))
+            return
+        self.copy_finished.emit(dest_path)
 
 class AddEditDialog(QDialog):
     def __init__(self, mistake_id=None, parent=None):
@@ -120,18 +120,11 @@ class AddEditDialog(QDialog):
                 self.image_preview.setPixmap(pixmap.scaled(self.image_preview.size().width(), self.image_preview.size().height(), Qt.AspectRatioMode.KeepAspectRatio))
 
     def _upload_image(self):
-        if not os.path.exists(ASSETS_DIR):
-            os.makedirs(ASSETS_DIR)
-
         file_path, _ = QFileDialog.getOpenFileName(self, "选择图片", "", "图片文件 (*.png *.jpg *.jpeg *.bmp)")
         if file_path:
-            root, ext = os.path.splitext(file_path)
-            new_filename = f"{uuid.uuid4()}{ext}"
-            dest_path = os.path.join(ASSETS_DIR, new_filename).replace("\\", "/")
-
             def on_copy_finished(path):
-                import os
-                self.image_path = os.path.abspath(path)
+                # 直接保存 ImageStore 返回的规范路径，引用计数按同一形式匹配
+                self.image_path = path
                 pixmap = QPixmap(self.image_path)
                 print(f"pixmap size: {pixmap.size()}, label size: {self.image_preview.size()}")
                 if pixmap.isNull():
@@ -141,8 +134,9 @@ class AddEditDialog(QDialog):
                     self.image_preview.setPixmap(pixmap.scaled(self.image_preview.size().width(), self.image_preview.size().height(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
                     self.image_preview.repaint()
 
-            self.copy_thread = ImageCopyThread(file_path, dest_path)
+            self.copy_thread = ImageCopyThread(file_path, ImageStore())
             self.copy_thread.copy_finished.connect(on_copy_finished)
+            self.copy_thread.copy_failed.connect(lambda message: QMessageBox.critical(self, "错误", f"上传图片失败: {message}"))
             self.copy_thread.start()
 
     def get_data(self):
@@ -0,0 +1,54 @@
+# app/ui/batch_edit_dialog.py
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QComboBox, QLabel, QPushButton
+
+
+class BatchEditDialog(QDialog):
+    """
+    批量修改选中错题的分类，选择“不修改”的字段保持原值。
+    """
+
+    def __init__(self, count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("批量修改分类")
+        self.setMinimumSize(300, 200)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"修改选中的 {count} 道错题："))
+
+        # 年级
+        self.grade_combo = QComboBox()
+        self.grade_combo.addItem("不修改")
+        self.grade_combo.addItems(["7年级", "8年级", "9年级"])
+        layout.addWidget(QLabel("年级："))
+        layout.addWidget(self.grade_combo)
+
+        # 学期
+        self.semester_combo = QComboBox()
+        self.semester_combo.addItem("不修改")
+        self.semester_combo.addItems(["上册", "下册"])
+        layout.addWidget(QLabel("学期："))
+        layout.addWidget(self.semester_combo)
+
+        # 学科
+        self.subject_combo = QComboBox()
+        self.subject_combo.addItem("不修改")
+        self.subject_combo.addItems(["语文", "数学", "英语", "物理", "化学", "地理", "生物", "道法", "历史"])
+        layout.addWidget(QLabel("学科："))
+        layout.addWidget(self.subject_combo)
+
+        # 按钮
+        btn_layout = QHBoxLayout()
+        self.ok_btn = QPushButton("确定")
+        self.cancel_btn = QPushButton("取消")
+        btn_layout.addWidget(self.ok_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+
+        self.ok_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+
+    def get_changes(self):
+        """
+        返回需要修改的字段，未修改的字段不包含在内。
+        """
+        combos = {"grade": self.grade_combo, "semester": self.semester_combo, "subject": self.subject_combo}
+        return {field: combo.currentText() for field, combo in combos.items() if combo.currentIndex() > 0}
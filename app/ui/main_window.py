@@ -1,22 +1,91 @@
 # app/ui/main_window.py
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                  QPushButton, QTableView, QComboBox, QLineEdit,
-                                  QHeaderView, QLabel, QMessageBox, QInputDialog, QFileDialog, QMenu)
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEngineSettings
-from PySide6.QtGui import QStandardItemModel, QStandardItem, QIcon, QPixmap
-from PySide6.QtCore import Qt
+                                  QHeaderView, QLabel, QMessageBox, QInputDialog, QFileDialog, QMenu,
+                                  QProgressDialog)
+from PySide6.QtGui import QIcon, QPixmap, QKeySequence, QShortcut, QCursor
+from PySide6.QtCore import Qt, QTimer, QEvent, QObject, QRunnable, QThreadPool, Signal
 
 from app.ui.add_edit_dialog import AddEditDialog
-from app.ui.review_dialog import ReviewDialog
-from app.data.database import get_mistakes, get_mistake_by_id, get_random_mistakes
+from app.ui.mistake_table_model import MistakeTableModel
+from app.data.database import (init_db, get_mistake_ids, get_mistake_by_id, get_due_mistakes,
+                               recategorize_mistakes)
 from app.logic.mistake_service import MistakeService
-from app.utils.renderer import render_html_with_katex
+from app.logic.review_sampler import ReviewSampler
+from app.utils import tracing
+from app.utils.startup_profile import get_startup_profiler
 from app.utils.version import get_version
 import os
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton
 
+
+class _DbInitSignals(QObject):
+    finished = Signal(str)  # 错误信息，成功时为空字符串
+
+
+class _DbInitTask(QRunnable):
+    """
+    在线程池中初始化数据库，完成后通过信号回到界面线程。
+    """
+
+    def __init__(self, signals):
+        super().__init__()
+        self.signals = signals
+
+    def run(self):
+        try:
+            with get_startup_profiler().phase("db"):
+                init_db()
+        except Exception as e:
+            self.signals.finished.emit(str(e))
+        else:
+            self.signals.finished.emit("")
+
+
+class _TaskSignals(QObject):
+    progress = Signal(object, object)  # (done, total)，备份按字节计数，可能超过 32 位整数
+    finished = Signal(object)
+    failed = Signal(str)
+
+
+class _BackgroundTask(QRunnable):
+    """
+    在线程池中运行耗时操作 fn(progress=...)，进度和结果通过信号回到界面线程。
+    cancel() 后进度回调返回 False，由 fn 在合适的位置停止。
+    """
+
+    def __init__(self, fn, signals):
+        super().__init__()
+        # 界面线程持有任务对象以便取消，不交给线程池删除
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.signals = signals
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _on_progress(self, done, total):
+        self.signals.progress.emit(done, total)
+        return not self.cancelled
+
+    def run(self):
+        try:
+            result = self.fn(progress=self._on_progress)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
 class MainWindow(QMainWindow):
+    # 筛选条件变化后等待的时间（毫秒），期间的再次修改会重新计时
+    FILTER_DEBOUNCE_MS = 250
+    # 窗口一直没有绘制（如最小化启动）时，最多等待这么久再开始延后的初始化
+    DEFERRED_INIT_FALLBACK_MS = 200
+    # 数据库就绪后等待这么久再在后台清理无引用的配图，不与启动争抢磁盘
+    IMAGE_GC_DELAY_MS = 60 * 1000
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle(f"启思录 (Insight Folio) {get_version()}")
@@ -26,10 +95,21 @@ class MainWindow(QMainWindow):
             self.setWindowIcon(QIcon(icon_path))
         self.setGeometry(100, 100, 1600, 900)
         self.mistake_service = MistakeService()
+        # 同一会话内连续复习时不重复抽题
+        self.review_sampler = ReviewSampler()
+        # 正在后台运行的导入、备份等任务，运行期间保持引用以便取消
+        self._background_tasks = set()
+        # 导入、备份、恢复和清理图片等耗时的维护任务在单独的线程池中依次运行，
+        # 全局线程池留给加载列表、生成预览图等短任务，维护期间界面仍然可以正常使用
+        self._maintenance_pool = QThreadPool(self)
+        self._maintenance_pool.setMaxThreadCount(1)
+        # 窗口先显示外壳；数据库初始化、预览视图和第一页数据在首次绘制后再加载（见 start_deferred_init）
+        self.details_area = None
+        self._db_ready = False
+        self._deferred_started = False
+        self._startup_pending = {"webengine", "first_data"}
         self._init_ui()
         self._connect_signals()
-        self.semester_filter.currentIndexChanged.connect(self.load_mistakes)  # 强制确保信号连接
-        self.load_mistakes()
         # 设置表格支持右键菜单
         self.table_view.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table_view.customContextMenuRequested.connect(self._show_context_menu)
@@ -79,8 +159,7 @@ class MainWindow(QMainWindow):
 
         # 错题表格
         self.table_view = QTableView()
-        self.model = QStandardItemModel()
-        self.model.setHorizontalHeaderLabels(["ID", "年级", "学期", "学科", "录入日期", "错题摘要"])
+        self.model = MistakeTableModel(self)
         self.table_view.setModel(self.model)
         self.table_view.setColumnHidden(0, True) # 隐藏ID列
         header = self.table_view.horizontalHeader()
@@ -93,7 +172,12 @@ class MainWindow(QMainWindow):
         self.table_view.setColumnWidth(3, 4 * 8)  # 学科
         self.table_view.setColumnWidth(4, 6 * 8)  # 录入日期
         self.table_view.setSelectionBehavior(QTableView.SelectRows)
+        # 按住 Ctrl/Shift 可多选，批量删除或修改分类
+        self.table_view.setSelectionMode(QTableView.ExtendedSelection)
         self.table_view.setEditTriggers(QTableView.NoEditTriggers)
+        # 点击表头时由数据库排序，默认按录入顺序倒序
+        self.table_view.horizontalHeader().setSortIndicator(0, Qt.DescendingOrder)
+        self.table_view.setSortingEnabled(True)
         left_layout.addWidget(self.table_view)
         
         # 操作按钮
@@ -108,27 +192,40 @@ class MainWindow(QMainWindow):
         self.review_button.setObjectName("actionButton")
         self.export_button = QPushButton("导出PDF")
         self.export_button.setObjectName("actionButton")
+        self.import_button = QPushButton("批量导入")
+        self.import_button.setObjectName("actionButton")
+        self.backup_button = QPushButton("数据维护")
+        self.backup_button.setObjectName("actionButton")
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.edit_button)
         button_layout.addWidget(self.delete_button)
         button_layout.addWidget(self.review_button)
         button_layout.addWidget(self.export_button)
+        button_layout.addWidget(self.import_button)
+        button_layout.addWidget(self.backup_button)
         self.about_button = QPushButton("关于")
         self.about_button.setObjectName("actionButton")
         button_layout.addWidget(self.about_button)
         left_layout.addLayout(button_layout)
         
         # 右侧详情区域
-        right_layout = QVBoxLayout()
-        self.details_area = QWebEngineView()
-        self.details_area.settings().setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
+        self.right_layout = QVBoxLayout()
+        # 预览视图需要启动 WebEngine，先用占位标签代替
+        self.details_placeholder = QLabel("正在加载...")
+        self.details_placeholder.setAlignment(Qt.AlignCenter)
         
 # 删除"错题详情:"的 QLabel
 # right_layout.addWidget(QLabel("错题详情:"))
-        right_layout.addWidget(self.details_area)
+        self.right_layout.addWidget(self.details_placeholder)
+        # 数据库就绪前禁用需要读写数据库的操作
+        self._db_actions = (self.add_button, self.edit_button, self.delete_button,
+                            self.review_button, self.export_button, self.import_button, self.backup_button,
+                            self.filter_button)
+        for widget in self._db_actions:
+            widget.setEnabled(False)
         
         main_layout.addLayout(left_layout, stretch=2)
-        main_layout.addLayout(right_layout, stretch=1)
+        main_layout.addLayout(self.right_layout, stretch=1)
 
     def _connect_signals(self):
         """连接信号与槽"""
@@ -137,59 +234,178 @@ class MainWindow(QMainWindow):
         self.delete_button.clicked.connect(self.delete_mistake)
         self.review_button.clicked.connect(self.start_review)
         self.export_button.clicked.connect(self.export_to_pdf)
+        self.import_button.clicked.connect(self.import_mistakes)
+        self.backup_button.clicked.connect(self._show_backup_menu)
         self.filter_button.clicked.connect(self.load_mistakes)
-        self.table_view.selectionModel().selectionChanged.connect(self.display_mistake_details)
+        self.model.load_failed.connect(lambda message: QMessageBox.critical(self, "错误", f"加载错题失败: {message}"))
+        # 一次点击中选择和当前行先后变化，两者都更新之后再刷新预览，同一次点击只读取一次错题
+        self.details_timer = QTimer(self)
+        self.details_timer.setSingleShot(True)
+        self.details_timer.setInterval(0)
+        self.details_timer.timeout.connect(self.display_mistake_details)
+        selection_model = self.table_view.selectionModel()
+        selection_model.selectionChanged.connect(lambda selected, deselected: self.details_timer.start())
+        selection_model.currentChanged.connect(lambda current, previous: self.details_timer.start())
         self.about_button.clicked.connect(self.show_about_dialog)
-        # 新增：下拉框选择后自动筛选
-        self.grade_filter.currentIndexChanged.connect(self.load_mistakes)
-        self.subject_filter.currentIndexChanged.connect(self.load_mistakes)
-        self.semester_filter.currentIndexChanged.connect(self.load_mistakes)
+        # 下拉框选择和关键词输入后自动筛选；连续修改只在停顿后查询一次
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(self.FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.load_mistakes)
+        self.grade_filter.currentIndexChanged.connect(self.filter_timer.start)
+        self.subject_filter.currentIndexChanged.connect(self.filter_timer.start)
+        self.semester_filter.currentIndexChanged.connect(self.filter_timer.start)
+        self.keyword_filter.textChanged.connect(self.filter_timer.start)
+        self.model.first_page_loaded.connect(self._on_first_page_loaded)
+        # 隐藏的调试菜单（耗时追踪）
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, activated=self._show_debug_menu)
+
+    def start_deferred_init(self):
+        """
+        窗口显示后开始延后的初始化：首次绘制完成（或等待超时）后在后台初始化数据库并加载第一页，
+        同时在界面线程创建预览视图。
+        """
+        self.installEventFilter(self)
+        QTimer.singleShot(self.DEFERRED_INIT_FALLBACK_MS, self._run_deferred_init)
+
+    def eventFilter(self, watched, event):
+        if watched is self and event.type() == QEvent.Paint and not self._deferred_started:
+            get_startup_profiler().mark("first_paint")
+            # 等这一帧绘制完成后再继续
+            QTimer.singleShot(0, self._run_deferred_init)
+        return super().eventFilter(watched, event)
+
+    def _run_deferred_init(self):
+        if self._deferred_started:
+            return
+        self._deferred_started = True
+        self.removeEventFilter(self)
+        self._db_init_signals = _DbInitSignals(self)
+        self._db_init_signals.finished.connect(self._on_db_ready)
+        QThreadPool.globalInstance().start(_DbInitTask(self._db_init_signals))
+        QTimer.singleShot(0, self._create_preview)
+
+    def _create_preview(self):
+        """创建预览视图（首次导入并启动 WebEngine）"""
+        profiler = get_startup_profiler()
+        with profiler.phase("webengine"):
+            from app.ui.math_view import MathPreviewView
+            self.details_area = MathPreviewView()
+        self.right_layout.replaceWidget(self.details_placeholder, self.details_area)
+        self.details_placeholder.deleteLater()
+        self.details_placeholder = None
+        # 补上预览创建前已选中的错题
+        self.display_mistake_details()
+        self._startup_step_done("webengine")
+
+    def _on_db_ready(self, error):
+        if error:
+            QMessageBox.critical(self, "错误", f"初始化数据库失败: {error}")
+            return
+        self._db_ready = True
+        for widget in self._db_actions:
+            widget.setEnabled(True)
+        self.load_mistakes()
+        QTimer.singleShot(self.IMAGE_GC_DELAY_MS, self._collect_image_garbage)
+
+    def _collect_image_garbage(self):
+        """在后台分批清理超过保留期且无引用的配图，不显示界面"""
+        from app.logic.image_gc import collect_garbage
+        signals = _TaskSignals(self)
+        task = _BackgroundTask(collect_garbage, signals)
+        self._background_tasks.add(task)
+
+        def on_done(_result):
+            self._background_tasks.discard(task)
+            signals.deleteLater()
+
+        signals.finished.connect(on_done)
+        signals.failed.connect(on_done)
+        self._maintenance_pool.start(task)
+
+    def _on_first_page_loaded(self):
+        if "first_data" in self._startup_pending:
+            get_startup_profiler().mark("first_data")
+            self._startup_step_done("first_data")
+
+    def _startup_step_done(self, step):
+        self._startup_pending.discard(step)
+        if not self._startup_pending:
+            get_startup_profiler().finish()
+
+    def _show_debug_menu(self):
+        """显示调试菜单：开关耗时追踪、查看统计、导出 Chrome trace"""
+        menu = QMenu(self)
+        toggle_action = menu.addAction("记录耗时")
+        toggle_action.setCheckable(True)
+        toggle_action.setChecked(tracing.is_enabled())
+        stats_action = menu.addAction("查看耗时统计")
+        dump_action = menu.addAction("导出追踪文件...")
+        reset_action = menu.addAction("清空记录")
+
+        action = menu.exec(QCursor.pos())
+        if action is toggle_action:
+            tracing.enable() if toggle_action.isChecked() else tracing.disable()
+        elif action is stats_action:
+            box = QMessageBox(self)
+            box.setWindowTitle("耗时统计 (ms)")
+            box.setText("最近样本的百分位耗时：")
+            # KaTeX 资源缓存的命中次数是进程启动以来的累计值，不随“清空记录”归零
+            from app.utils.renderer import get_renderer
+            cache = get_renderer().cache_stats()
+            box.setDetailedText(f"{tracing.format_stats()}\n\n"
+                                f"KaTeX 资源缓存: 命中 {cache['hits']} 次，未命中（重新读取）{cache['misses']} 次")
+            box.exec()
+        elif action is dump_action:
+            filepath, _ = QFileDialog.getSaveFileName(self, "保存追踪文件", "folio-trace.json", "JSON Files (*.json)")
+            if filepath:
+                try:
+                    tracing.dump_chrome_trace(filepath)
+                except OSError as e:
+                    QMessageBox.critical(self, "错误", f"保存追踪文件失败: {e}")
+        elif action is reset_action:
+            tracing.reset()
 
     def show_about_dialog(self):
         dialog = AboutDialog(self)
         dialog.exec()
 
     def load_mistakes(self):
-        """加载错题到表格"""
+        """加载错题到表格（后台查询，结果返回后再刷新表格）"""
+        self.filter_timer.stop()
+        if not self._db_ready:
+            # 数据库就绪后会自动加载
+            return
         filters = {
             "grade": self.grade_filter.currentText() if self.grade_filter.currentIndex() > 0 else "",
             "semester": self.semester_filter.currentText() if self.semester_filter.currentIndex() > 0 else "",
             "subject": self.subject_filter.currentText() if self.subject_filter.currentIndex() > 0 else "",
-            "question_desc": self.keyword_filter.text()
+            "keyword": self.keyword_filter.text()
         }
         
-        mistakes = get_mistakes(filters)
-        self.model.removeRows(0, self.model.rowCount())
-        for mistake in mistakes:
-            # 生成摘要
-            summary = mistake['question_desc'][:50] + '...' if len(mistake['question_desc']) > 50 else mistake['question_desc']
-            row = [
-                QStandardItem(str(mistake['id'])),
-                QStandardItem(mistake['grade']),
-                QStandardItem(mistake['semester']),
-                QStandardItem(mistake['subject']),
-                QStandardItem(mistake['record_date']),
-                QStandardItem(summary.replace('\n', ' ')), # 替换换行符，避免显示问题
-            ]
-            self.model.appendRow(row)
-
-    def display_mistake_details(self, selected, deselected):
-        """显示选中错题的详细信息"""
-        if not selected.indexes():
-            self.details_area.setHtml("")
+        self.model.set_filters(filters)
+
+    def display_mistake_details(self):
+        """显示当前行的详细信息；当前行未被选中时（如 Ctrl 点击取消选择）显示第一个选中的行"""
+        if self.details_area is None:
             return
-            
-        row = selected.indexes()[0].row()
-        mistake_id = self.model.item(row, 0).text()
-        mistake = get_mistake_by_id(int(mistake_id))
+        selection_model = self.table_view.selectionModel()
+        current = selection_model.currentIndex()
+        if current.isValid() and selection_model.isRowSelected(current.row()):
+            row = current.row()
+        else:
+            rows = [index.row() for index in selection_model.selectedRows()]
+            if not rows:
+                self.details_area.clear_content()
+                return
+            row = min(rows)
+        mistake = get_mistake_by_id(self.model.mistake_id(row))
 
         if not mistake:
-            self.details_area.setHtml("")
+            self.details_area.clear_content()
             return
-            
-        mistake_dict = dict(mistake)
-        html_content = render_html_with_katex(mistake_dict, show_answer=True)
-        self.details_area.setHtml(html_content)
+
+        self.details_area.show_mistake(dict(mistake), show_answer=True)
 
 
     def add_mistake(self):
@@ -198,51 +414,90 @@ class MainWindow(QMainWindow):
         if dialog.exec():
             self.load_mistakes()
 
+    def _selected_mistake_ids(self):
+        """返回选中行的错题 ID（按表格中的顺序）"""
+        rows = sorted(index.row() for index in self.table_view.selectionModel().selectedRows())
+        return [self.model.mistake_id(row) for row in rows]
+
     def edit_mistake(self):
-        """打开编辑错题对话框"""
+        """打开编辑错题对话框；选中多条时批量修改分类"""
         selected_indexes = self.table_view.selectionModel().selectedRows()
         if not selected_indexes:
             QMessageBox.warning(self, "警告", "请先选择要编辑的错题。")
             return
+        if len(selected_indexes) > 1:
+            self.recategorize_mistakes()
+            return
         
         row = selected_indexes[0].row()
-        mistake_id = int(self.model.item(row, 0).text())
+        mistake_id = self.model.mistake_id(row)
         
         dialog = AddEditDialog(mistake_id=mistake_id, parent=self)
         if dialog.exec():
             self.load_mistakes()
-            self.display_mistake_details(self.table_view.selectionModel().selection(), None)
+            self.display_mistake_details()
+
+    def recategorize_mistakes(self):
+        """批量修改选中错题的年级、学期和学科（在一个事务中完成）"""
+        mistake_ids = self._selected_mistake_ids()
+        if not mistake_ids:
+            QMessageBox.warning(self, "警告", "请先选择要修改的错题。")
+            return
+
+        from app.ui.batch_edit_dialog import BatchEditDialog
+        dialog = BatchEditDialog(len(mistake_ids), self)
+        if not dialog.exec():
+            return
+        changes = dialog.get_changes()
+        if not changes:
+            return
+        try:
+            updated = recategorize_mistakes(mistake_ids, changes)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"修改失败: {e}")
+            return
+        # 修改后的错题可能不再符合当前筛选条件，重新加载一次
+        self.load_mistakes()
+        QMessageBox.information(self, "成功", f"已修改 {updated} 道错题的分类。")
 
     def delete_mistake(self):
-        """删除选中的错题"""
-        selected_indexes = self.table_view.selectionModel().selectedRows()
-        if not selected_indexes:
+        """删除选中的错题（可多选，在一个事务中删除）"""
+        mistake_ids = self._selected_mistake_ids()
+        if not mistake_ids:
             QMessageBox.warning(self, "警告", "请先选择要删除的错题。")
             return
 
-        reply = QMessageBox.question(self, '确认删除', '确定要删除这条错题记录吗？此操作不可撤销。',
+        if len(mistake_ids) == 1:
+            question = '确定要删除这条错题记录吗？此操作不可撤销。'
+        else:
+            question = f'确定要删除选中的 {len(mistake_ids)} 条错题记录吗？此操作不可撤销。'
+        reply = QMessageBox.question(self, '确认删除', question,
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
 
         if reply == QMessageBox.Yes:
-            # Since selection mode is SelectRows, we can get the row from the first index.
-            row = selected_indexes[0].row()
-            mistake_id = int(self.model.item(row, 0).text())
             try:
-                self.mistake_service.delete_mistake_with_assets(mistake_id)
-                self.load_mistakes()
-                self.details_area.setHtml("")
-                QMessageBox.information(self, "成功", "错题已删除。")
+                # 配图在后台删除；列表直接移除这些行，不重新查询
+                deleted = self.mistake_service.delete_mistakes_with_assets(mistake_ids)
+                self.model.remove_ids(mistake_ids)
+                if self.details_area is not None:
+                    self.details_area.clear_content()
+                QMessageBox.information(self, "成功", f"已删除 {deleted} 条错题。")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"删除失败: {e}")
 
     def start_review(self):
-        """开始随机复习（弹出条件选择对话框）"""
-        from app.ui.review_dialog import ReviewConfigDialog
+        """开始复习（弹出条件选择对话框）"""
+        from app.ui.review_dialog import ReviewDialog, ReviewConfigDialog, REVIEW_MODE_DUE_FIRST
         dialog = ReviewConfigDialog(self)
         if dialog.exec():
-            filters, num = dialog.get_config()
-            from app.data.database import get_random_mistakes
-            mistakes = get_random_mistakes(num, filters)
+            filters, num, mode = dialog.get_config()
+            mistakes = []
+            if mode == REVIEW_MODE_DUE_FIRST:
+                # 先取已到期的题，不足部分随机补齐
+                mistakes = list(get_due_mistakes(num, filters))
+            if len(mistakes) < num:
+                mistakes += self.review_sampler.sample(num - len(mistakes), filters,
+                                                       exclude=[m['id'] for m in mistakes])
             if not mistakes:
                 QMessageBox.information(self, "提示", "没有找到符合条件的错题。")
                 return
@@ -254,22 +509,218 @@ class MainWindow(QMainWindow):
         filters = {
             "grade": self.grade_filter.currentText() if self.grade_filter.currentIndex() > 0 else "",
             "subject": self.subject_filter.currentText() if self.subject_filter.currentIndex() > 0 else "",
-            "question_desc": self.keyword_filter.text()
+            "keyword": self.keyword_filter.text()
         }
-        mistakes_to_export = get_mistakes(filters)
+        mistake_ids = get_mistake_ids(filters, listing_order=True)
 
-        if not mistakes_to_export:
+        if not mistake_ids:
             QMessageBox.information(self, "提示", "没有可导出的错题。")
             return
 
         filepath, _ = QFileDialog.getSaveFileName(self, "保存PDF文件", "", "PDF Files (*.pdf)")
         if filepath:
+            from app.logic.pdf_exporter import PdfExportCancelled
+            total = len(mistake_ids)
+            progress_dialog = QProgressDialog("正在导出PDF...", "取消", 0, total, self)
+            progress_dialog.setWindowTitle("导出PDF")
+            progress_dialog.setWindowModality(Qt.WindowModal)
+            progress_dialog.setMinimumDuration(0)
+            progress_dialog.setValue(0)
+
+            def on_progress(done, total):
+                progress_dialog.setLabelText(f"正在导出PDF... {done}/{total}")
+                progress_dialog.setValue(done)
+                return not progress_dialog.wasCanceled()
+
             try:
-                self.mistake_service.export_to_pdf(mistakes_to_export, filepath)
+                self.mistake_service.export_to_pdf(mistake_ids, filepath, progress=on_progress,
+                                                   cancelled=progress_dialog.wasCanceled)
+                progress_dialog.close()
                 QMessageBox.information(self, "成功", f"PDF文件已成功导出到:\n{filepath}")
+            except PdfExportCancelled:
+                progress_dialog.close()
             except Exception as e:
+                progress_dialog.close()
                 QMessageBox.critical(self, "错误", f"导出PDF失败: {e}")
 
+    def import_mistakes(self):
+        """从 CSV/JSON 文件批量导入错题，配图可以放在文件夹或 zip 压缩包中"""
+        data_path, _ = QFileDialog.getOpenFileName(self, "选择错题数据文件", "",
+                                                   "错题数据 (*.csv *.json *.jsonl)")
+        if not data_path:
+            return
+        images_path = None
+        answer = QMessageBox.question(self, "选择配图",
+                                      "配图是否打包为 zip 压缩包？\n选择“否”从文件夹读取配图，取消则按数据文件所在目录查找。",
+                                      QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+        if answer == QMessageBox.Yes:
+            images_path, _ = QFileDialog.getOpenFileName(self, "选择配图压缩包", "", "Zip (*.zip)")
+        elif answer == QMessageBox.No:
+            images_path = QFileDialog.getExistingDirectory(self, "选择配图文件夹")
+        images_path = images_path or None
+
+        def on_finished(result):
+            message = f"已导入 {result['imported']} 道错题。"
+            if result["resumed_from"]:
+                message += f"\n（从第 {result['resumed_from'] + 1} 行继续上次未完成的导入）"
+            if result["cancelled"]:
+                message += "\n导入已取消，再次导入同一文件会从中断处继续。"
+            errors = result["errors"]
+            if errors:
+                details = "\n".join(f"第 {row} 行: {error}" for row, error in errors[:20])
+                more = f"\n……共 {len(errors)} 行" if len(errors) > 20 else ""
+                message += f"\n\n以下行未导入:\n{details}{more}"
+            QMessageBox.information(self, "导入完成", message)
+
+        from app.logic.importer import import_mistakes
+        self._run_in_background(
+            "批量导入",
+            lambda progress: import_mistakes(data_path, images_path, progress=progress),
+            lambda done, total: f"正在导入... {done}/{total}",
+            on_finished, "导入失败",
+            # 失败前已提交的批次需要显示出来
+            after=self.load_mistakes)
+
+    def _show_backup_menu(self):
+        """显示数据维护菜单：备份、校验备份、从备份恢复、清理未使用的图片"""
+        menu = QMenu(self)
+        backup_action = menu.addAction("备份到...")
+        full_backup_action = menu.addAction("完整备份到...")
+        verify_action = menu.addAction("校验备份...")
+        restore_action = menu.addAction("从备份恢复...")
+        menu.addSeparator()
+        gc_action = menu.addAction("清理未使用的图片...")
+        chosen = menu.exec(QCursor.pos())
+        if chosen in (backup_action, full_backup_action):
+            self.backup_library(full=chosen is full_backup_action)
+        elif chosen is verify_action:
+            self.restore_library(verify_only=True)
+        elif chosen is restore_action:
+            self.restore_library()
+        elif chosen is gc_action:
+            self.clean_unused_images()
+
+    def clean_unused_images(self):
+        """扫描无引用的配图和失效的预览缓存，报告可释放的空间，确认后在后台分批删除"""
+        from app.logic.image_gc import scan_orphans, collect_orphans, GC_GRACE_SECONDS
+
+        def on_scanned(scan):
+            orphans = scan["orphans"]
+            if not orphans:
+                QMessageBox.information(self, "清理图片", f"检查了 {scan['scanned']} 个文件，没有需要清理的图片。")
+                return
+            warning = (f"\n\n注意：{scan['warning']}，数据库可能与配图目录不匹配，"
+                       f"删除前请确认已有备份。") if scan["warning"] else ""
+            reply = QMessageBox.question(
+                self, "清理图片",
+                f"找到 {len(orphans)} 个未被任何错题使用的文件（最近 {GC_GRACE_SECONDS // 3600} 小时内的文件不计入），"
+                f"可释放 {scan['reclaimable_bytes'] / 1048576:.1f} MB。确定删除吗？{warning}",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+            self._run_in_background(
+                "清理图片", lambda progress: collect_orphans(orphans, progress=progress),
+                lambda done, total: f"正在清理... {done}/{total}",
+                lambda result: QMessageBox.information(
+                    self, "清理完成",
+                    f"已删除 {result['removed']} 个文件，释放 {result['freed_bytes'] / 1048576:.1f} MB。"),
+                "清理失败")
+
+        self._run_in_background("扫描图片", lambda progress: scan_orphans(),
+                                lambda done, total: "正在扫描...", on_scanned, "扫描失败")
+
+    def backup_library(self, full=False):
+        """在后台备份数据库和配图，备份期间可以继续使用"""
+        backup_dir = QFileDialog.getExistingDirectory(self, "选择备份目录")
+        if not backup_dir:
+            return
+        from app.logic.backup import create_backup
+
+        def on_finished(result):
+            QMessageBox.information(
+                self, "备份完成",
+                f"已备份到:\n{result['archive']}\n\n新增配图 {result['new_images']} 个，"
+                f"共 {result['total_images']} 个；压缩包 {result['archive_size'] / 1048576:.1f} MB，"
+                f"用时 {result['elapsed']:.1f} 秒。")
+
+        self._run_in_background(
+            "备份", lambda progress: create_backup(backup_dir, full=full, progress=progress),
+            lambda done, total: f"正在备份... {done / 1048576:.1f}/{total / 1048576:.1f} MB",
+            on_finished, "备份失败", modal=False)
+
+    def restore_library(self, verify_only=False):
+        """校验备份或从备份恢复，恢复前校验全部文件"""
+        archive_path, _ = QFileDialog.getOpenFileName(self, "选择备份文件", "", "启思录备份 (*.tar.gz)")
+        if not archive_path:
+            return
+        from app.logic.backup import restore_backup, verify_backup
+        if verify_only:
+            self._run_in_background(
+                "校验备份", lambda progress: verify_backup(archive_path, progress=progress),
+                lambda done, total: f"正在校验... {done / 1048576:.1f}/{total / 1048576:.1f} MB",
+                lambda manifest: QMessageBox.information(
+                    self, "校验完成", f"备份完好（{manifest['created']}，配图 {len(manifest['images'])} 个）。"),
+                "校验失败")
+            return
+
+        reply = QMessageBox.question(self, "确认恢复", "恢复会用备份中的数据覆盖当前的错题记录，确定继续吗？",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        self._run_in_background(
+            "从备份恢复", lambda progress: restore_backup(archive_path, progress=progress),
+            lambda done, total: f"正在恢复... {done / 1048576:.1f}/{total / 1048576:.1f} MB",
+            lambda restored: QMessageBox.information(self, "恢复完成", f"已恢复数据库和 {restored} 个配图。"),
+            "恢复失败", after=self.load_mistakes)
+
+    def _run_in_background(self, title, fn, describe_progress, on_finished, failure_message,
+                           after=None, modal=True):
+        """
+        在维护线程池中运行 fn(progress) 并显示可取消的进度对话框，前一个维护任务结束后才开始。
+        成功时调用 on_finished(result)；失败时提示 failure_message（取消不提示）；
+        无论结果如何最后调用 after()。modal 为 False 时运行期间可以继续操作主窗口。
+        """
+        progress_dialog = QProgressDialog(f"{title}...", "取消", 0, 0, self)
+        progress_dialog.setWindowTitle(title)
+        progress_dialog.setWindowModality(Qt.WindowModal if modal else Qt.NonModal)
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.setAutoClose(False)
+        progress_dialog.setAutoReset(False)
+
+        signals = _TaskSignals(self)
+        task = _BackgroundTask(fn, signals)
+        self._background_tasks.add(task)
+
+        def finish():
+            progress_dialog.close()
+            signals.deleteLater()
+            self._background_tasks.discard(task)
+
+        def on_progress(done, total):
+            # 进度条按千分比显示，字节数可能超出进度条的整数范围
+            progress_dialog.setMaximum(1000)
+            progress_dialog.setValue(done * 1000 // total if total else 0)
+            progress_dialog.setLabelText(describe_progress(done, total))
+
+        def on_task_finished(result):
+            finish()
+            on_finished(result)
+            if after is not None:
+                after()
+
+        def on_failed(error):
+            finish()
+            if not task.cancelled:
+                QMessageBox.critical(self, "错误", f"{failure_message}: {error}")
+            if after is not None:
+                after()
+
+        signals.progress.connect(on_progress)
+        signals.finished.connect(on_task_finished)
+        signals.failed.connect(on_failed)
+        progress_dialog.canceled.connect(task.cancel)
+        progress_dialog.show()
+        self._maintenance_pool.start(task)
 
     def _show_context_menu(self, pos):
         """显示表格的右键菜单"""
@@ -278,16 +729,19 @@ class MainWindow(QMainWindow):
         # 添加菜单项
         add_action = menu.addAction("新增")
         edit_action = menu.addAction("编辑")
+        recategorize_action = menu.addAction("修改分类...")
         delete_action = menu.addAction("删除")
         
         # 连接菜单项到现有方法
         add_action.triggered.connect(self.add_mistake)
         edit_action.triggered.connect(self.edit_mistake)
+        recategorize_action.triggered.connect(self.recategorize_mistakes)
         delete_action.triggered.connect(self.delete_mistake)
         
         # 根据选择状态设置菜单项可用性
         has_selection = bool(self.table_view.selectionModel().selectedRows())
         edit_action.setEnabled(has_selection)
+        recategorize_action.setEnabled(has_selection)
         delete_action.setEnabled(has_selection)
         
         # 显示菜单
@@ -0,0 +1,127 @@
+# app/ui/math_view.py
+import json
+
+from PySide6.QtWebEngineWidgets import QWebEngineView
+from PySide6.QtWebEngineCore import QWebEngineSettings
+
+from app.utils import tracing
+from app.utils.image_scheme import install_image_scheme_handler
+from app.utils.renderer import get_renderer, IMAGE_SIZE_PREVIEW
+
+
+class MathPreviewView(QWebEngineView):
+    """
+    常驻的错题预览视图。
+
+    KaTeX 外壳页面只加载一次，之后切换错题时通过 window.folio 桥接函数
+    原地替换内容并只对新内容重新渲染公式，显示答案只切换 CSS 类，
+    不再每次 setHtml 整页重载。配图通过 folio-img 协议按 image_size 尺寸加载。
+
+    preload_mistake() 可以提前在屏幕外渲染接下来要显示的错题，之后 show_mistake()
+    显示这些错题时只需移动已渲染好的节点；preload_hits/preload_misses 记录命中情况。
+    """
+
+    def __init__(self, parent=None, image_size=IMAGE_SIZE_PREVIEW):
+        super().__init__(parent)
+        self.image_size = image_size
+        install_image_scheme_handler(self.page().profile())
+        self.settings().setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
+        self._shell_ready = False
+        self._pending_scripts = []
+        self._preloaded = set()
+        self._preload_used = False
+        self.preload_hits = 0
+        self.preload_misses = 0
+        self.loadFinished.connect(self._on_shell_loaded)
+        self._shell_span = tracing.span("preview.shell_load")
+        self.setHtml(get_renderer().render_shell())
+
+    def _on_shell_loaded(self, success):
+        self._shell_span.finish(success=success)
+        if not success:
+            print("预览页面加载失败")
+            return
+        self._shell_ready = True
+        scripts, self._pending_scripts = self._pending_scripts, []
+        for script, _, trace in scripts:
+            self._execute(script, trace)
+
+    def _execute(self, script, trace):
+        if trace is None:
+            self.page().runJavaScript(script)
+        else:
+            # 脚本同步完成渲染，回调到达时即为“请求到渲染完成”的耗时
+            self.page().runJavaScript(script, 0, lambda _: trace.finish())
+
+    def _run_script(self, script, replaces_content=False, trace_name=None):
+        trace = tracing.span(trace_name) if trace_name and tracing.is_enabled() else None
+        if self._shell_ready:
+            self._execute(script, trace)
+            return
+        # 外壳尚未加载完成时暂存脚本；新内容会覆盖之前排队的内容（预渲染脚本保留）
+        if replaces_content:
+            self._pending_scripts = [item for item in self._pending_scripts if not item[1]]
+        self._pending_scripts.append((script, replaces_content, trace))
+
+    def set_content_html(self, html, show_answer=True):
+        """
+        用任意 HTML 片段替换当前内容。
+        """
+        self._run_script(
+            f"window.folio.setContent({json.dumps(html)}, {json.dumps(show_answer)});",
+            replaces_content=True,
+            trace_name="preview.set_content",
+        )
+
+    def show_mistake(self, mistake_data, show_answer=True):
+        """
+        显示一条错题。答案部分始终写入页面，由 show_answer 决定初始是否可见。
+        该错题已预渲染时直接换入预渲染好的节点。
+        """
+        key = str(mistake_data['id'])
+        if key in self._preloaded:
+            self._preloaded.discard(key)
+            self.preload_hits += 1
+            self._run_script(
+                f"window.folio.showPreloaded({json.dumps(key)}, {json.dumps(show_answer)});",
+                replaces_content=True,
+                trace_name="preview.show_preloaded",
+            )
+            return
+        if self._preload_used:
+            self.preload_misses += 1
+        fragment = get_renderer().render_body(mistake_data, show_answer=True, image_size=self.image_size)
+        self.set_content_html(fragment, show_answer)
+
+    def preload_mistake(self, mistake_data):
+        """
+        在屏幕外提前渲染一条错题，供之后的 show_mistake() 直接使用。
+        """
+        key = str(mistake_data['id'])
+        if key in self._preloaded:
+            return
+        self._preloaded.add(key)
+        self._preload_used = True
+        fragment = get_renderer().render_body(mistake_data, show_answer=True, image_size=self.image_size)
+        self._run_script(f"window.folio.preload({json.dumps(key)}, {json.dumps(fragment)});",
+                         trace_name="preview.preload")
+
+    def discard_preloaded(self, keep_ids=()):
+        """
+        丢弃 keep_ids 以外的预渲染内容。
+        """
+        keep = {str(mistake_id) for mistake_id in keep_ids}
+        self._preloaded &= keep
+        self._run_script(f"window.folio.discardPreloaded({json.dumps(sorted(keep))});")
+
+    def reveal_answer(self):
+        """
+        显示当前错题的答案和错误原因。
+        """
+        self._run_script("window.folio.showAnswer();")
+
+    def clear_content(self):
+        """
+        清空预览内容。
+        """
+        self.set_content_html("")
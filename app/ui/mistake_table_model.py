@@ -0,0 +1,167 @@
+# app/ui/mistake_table_model.py
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, Qt, Signal
+
+from app.data.database import get_mistake_page, LISTING_COLUMNS
+
+
+def _to_row(row):
+    values = [row[column] for column in LISTING_COLUMNS]
+    # 关键词命中时摘要列显示带高亮标记的片段
+    if 'snippet' in row.keys() and row['snippet']:
+        values[-1] = row['snippet'].replace('\n', ' ')
+    return tuple(values)
+
+
+class _PageLoaderSignals(QObject):
+    loaded = Signal(int, object, object)  # generation, rows, after
+    failed = Signal(int, str)
+
+
+class _FirstPageLoader(QRunnable):
+    """
+    在线程池中查询第一页数据，结果通过信号回到界面线程。
+    """
+
+    def __init__(self, generation, query_args, signals):
+        super().__init__()
+        self.generation = generation
+        self.query_args = query_args
+        self.signals = signals
+
+    def run(self):
+        try:
+            rows, after = get_mistake_page(*self.query_args)
+            rows = [_to_row(row) for row in rows]
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+        else:
+            self.signals.loaded.emit(self.generation, rows, after)
+
+
+class MistakeTableModel(QAbstractTableModel):
+    """
+    错题列表的惰性分页模型。
+
+    只查询列表所需的字段，视图滚动到底部时通过 canFetchMore/fetchMore 按页加载，
+    排序由数据库完成。每行以元组保存，顺序与 LISTING_COLUMNS 相同。
+
+    重新筛选或排序时第一页在后台线程查询，期间保留旧数据；每次请求递增
+    generation，只有最新一次请求的结果会被应用，过期结果直接丢弃。
+    """
+
+    load_failed = Signal(str)
+    first_page_loaded = Signal()
+
+    HEADERS = ["ID", "年级", "学期", "学科", "录入日期", "错题摘要"]
+    PAGE_SIZE = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 首次 set_filters() 之前为 None，此时排序只记录排序方式（数据库可能尚未初始化）
+        self._filters = None
+        self._sort_column = "id"
+        self._descending = True
+        self._rows = []
+        self._after = None
+        self._exhausted = True
+        self._loading = False
+        self._generation = 0
+        self._signals = _PageLoaderSignals(self)
+        self._signals.loaded.connect(self._on_first_page_loaded)
+        self._signals.failed.connect(self._on_load_failed)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        value = self._rows[index.row()][index.column()]
+        return str(value) if value is not None else ""
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        rows, self._after = get_mistake_page(self._filters, self._sort_column, self._descending,
+                                             self._after, self.PAGE_SIZE)
+        self._exhausted = self._after is None
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+            self._rows.extend(_to_row(row) for row in rows)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_column = LISTING_COLUMNS[column]
+        self._descending = order == Qt.DescendingOrder
+        if self._filters is not None:
+            self.reload()
+
+    def set_filters(self, filters):
+        """
+        设置筛选条件并从第一页重新加载。
+        """
+        self._filters = dict(filters)
+        self.reload()
+
+    def reload(self):
+        """
+        在后台重新加载第一页，之前未完成的加载结果将被丢弃。
+        """
+        self._generation += 1
+        self._loading = True
+        query_args = (self._filters, self._sort_column, self._descending, None, self.PAGE_SIZE)
+        QThreadPool.globalInstance().start(_FirstPageLoader(self._generation, query_args, self._signals))
+
+    def _on_first_page_loaded(self, generation, rows, after):
+        if generation != self._generation:
+            return
+        self.beginResetModel()
+        self._rows = rows
+        self._after = after
+        self._exhausted = after is None
+        self._loading = False
+        self.endResetModel()
+        self.first_page_loaded.emit()
+
+    def _on_load_failed(self, generation, message):
+        if generation != self._generation:
+            return
+        self._loading = False
+        self.load_failed.emit(message)
+
+    def remove_ids(self, mistake_ids):
+        """
+        从已加载的行中移除已删除的错题，不重新查询数据库。连续的行合并为一次移除。
+        """
+        if self._loading:
+            # 正在加载的第一页可能是删除前查询的
+            self.reload()
+            return
+        removed = set(mistake_ids)
+        rows = [index for index, row in enumerate(self._rows) if row[0] in removed]
+        # 从后往前按连续区间移除，前面的行号不受影响
+        while rows:
+            last = rows.pop()
+            first = last
+            while rows and rows[-1] == first - 1:
+                first = rows.pop()
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+
+    def mistake_id(self, row):
+        """
+        返回指定行的错题 ID。
+        """
+        return self._rows[row][0]
@@ -1,18 +1,28 @@
 # app/ui/review_dialog.py
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
-                                 QLabel, QSpacerItem, QSizePolicy, QComboBox, QSpinBox)
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEngineSettings
+                                 QLabel, QSpacerItem, QSizePolicy, QComboBox, QSpinBox, QMessageBox)
 from PySide6.QtCore import Qt
-import os
 
-from app.utils.renderer import render_html_with_katex
+from app.ui.math_view import MathPreviewView
+from app.logic.scheduler import record_review, QUALITY_FORGOT, QUALITY_HARD, QUALITY_GOOD
+from app.utils import tracing
+
+# 复习方式
+REVIEW_MODE_RANDOM = "random"
+REVIEW_MODE_DUE_FIRST = "due_first"
+
+# 复习时提前预渲染的题目数量
+REVIEW_LOOKAHEAD = 2
 
 class ReviewDialog(QDialog):
-    def __init__(self, mistakes, parent=None):
+    def __init__(self, mistakes, parent=None, lookahead=REVIEW_LOOKAHEAD):
         super().__init__(parent)
         self.mistakes = mistakes
         self.current_index = 0
+        # 显示当前题目后在后台预渲染接下来的 lookahead 道题，切换时直接换入
+        self.lookahead = max(0, lookahead)
+        # 整个复习过程记为一个追踪区间，结束时附带预渲染的命中/未命中次数
+        self._session_span = tracing.span("review.session", items=len(mistakes))
         
         self.setWindowTitle("错题复习")
         self.setMinimumSize(800, 600)
@@ -29,53 +39,92 @@ class ReviewDialog(QDialog):
         self.counter_label = QLabel()
         layout.addWidget(self.counter_label, alignment=Qt.AlignRight)
         
-        self.details_area = QWebEngineView()
-        self.details_area.settings().setAttribute(QWebEngineSettings.WebAttribute.LocalContentCanAccessFileUrls, True)
+        self.details_area = MathPreviewView()
         layout.addWidget(self.details_area)
         
         self.answer_button = QPushButton("显示答案")
+        # 看过答案后评价掌握程度，记录结果并进入下一题
+        self.forgot_button = QPushButton("没掌握")
+        self.hard_button = QPushButton("有点模糊")
+        self.good_button = QPushButton("已掌握")
         self.next_button = QPushButton("下一题")
         self.close_button = QPushButton("关闭")
         
         button_layout = QHBoxLayout()
         button_layout.addSpacerItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
         button_layout.addWidget(self.answer_button)
+        button_layout.addWidget(self.forgot_button)
+        button_layout.addWidget(self.hard_button)
+        button_layout.addWidget(self.good_button)
         button_layout.addWidget(self.next_button)
         button_layout.addWidget(self.close_button)
         layout.addLayout(button_layout)
 
     def _connect_signals(self):
         self.answer_button.clicked.connect(self.show_answer)
+        self.forgot_button.clicked.connect(lambda: self.rate_mistake(QUALITY_FORGOT))
+        self.hard_button.clicked.connect(lambda: self.rate_mistake(QUALITY_HARD))
+        self.good_button.clicked.connect(lambda: self.rate_mistake(QUALITY_GOOD))
         self.next_button.clicked.connect(self.next_mistake)
         self.close_button.clicked.connect(self.accept)
 
     def load_mistake(self):
         """加载当前错题"""
         if self.current_index >= len(self.mistakes):
-            self.details_area.setHtml("<h1>复习完成！</h1>")
+            self.details_area.set_content_html("<h1>复习完成！</h1>")
             self.answer_button.setEnabled(False)
+            self._set_rating_enabled(False)
             self.next_button.setEnabled(False)
             return
 
         self.answer_button.setEnabled(True)
+        self._set_rating_enabled(False)
         self.counter_label.setText(f"{self.current_index + 1} / {len(self.mistakes)}")
         
         mistake = self.mistakes[self.current_index]
-        html_content = render_html_with_katex(dict(mistake), show_answer=False)
-        self.details_area.setHtml(html_content)
+        self.details_area.show_mistake(dict(mistake), show_answer=False)
+        self._preload_ahead()
+
+    def _preload_ahead(self):
+        """预渲染接下来的几道题"""
+        upcoming = self.mistakes[self.current_index + 1:self.current_index + 1 + self.lookahead]
+        self.details_area.discard_preloaded([mistake['id'] for mistake in upcoming])
+        for mistake in upcoming:
+            self.details_area.preload_mistake(dict(mistake))
+
+    def preload_stats(self):
+        """返回预渲染的命中/未命中次数"""
+        return {"hits": self.details_area.preload_hits, "misses": self.details_area.preload_misses}
 
     def show_answer(self):
         """显示答案"""
-        mistake = self.mistakes[self.current_index]
-        html_content = render_html_with_katex(dict(mistake), show_answer=True)
-        self.details_area.setHtml(html_content)
+        self.details_area.reveal_answer()
         self.answer_button.setEnabled(False)
+        self._set_rating_enabled(True)
+
+    def _set_rating_enabled(self, enabled):
+        for button in (self.forgot_button, self.hard_button, self.good_button):
+            button.setEnabled(enabled)
+
+    def rate_mistake(self, quality):
+        """记录当前错题的复习结果并进入下一题"""
+        mistake = self.mistakes[self.current_index]
+        try:
+            record_review(mistake['id'], quality)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"记录复习结果失败: {e}")
+            return
+        self.next_mistake()
 
     def next_mistake(self):
         """加载下一题"""
         self.current_index += 1
         self.load_mistake()
 
+    def done(self, result):
+        self._session_span.finish(**self.preload_stats())
+        super().done(result)
+
 class ReviewConfigDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -104,6 +153,13 @@ class ReviewConfigDialog(QDialog):
         layout.addWidget(QLabel("学科："))
         layout.addWidget(self.subject_combo)
 
+        # 复习方式
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("随机抽取", REVIEW_MODE_RANDOM)
+        self.mode_combo.addItem("到期优先", REVIEW_MODE_DUE_FIRST)
+        layout.addWidget(QLabel("复习方式："))
+        layout.addWidget(self.mode_combo)
+
         # 题目数量
         self.count_spin = QSpinBox()
         self.count_spin.setMinimum(1)
@@ -131,4 +187,5 @@ class ReviewConfigDialog(QDialog):
             "subject": self.subject_combo.currentText() if self.subject_combo.currentIndex() > 0 else "",
         }
         count = self.count_spin.value()
-        return filters, count
\ No newline at end of file
+        mode = self.mode_combo.currentData()
+        return filters, count, mode
\ No newline at end of file
@@ -0,0 +1,155 @@
+# app/utils/image_scheme.py
+# 通过自定义 URL 协议 folio-img://mistake/<错题ID>?size=<尺寸> 向 WebEngine 提供题目配图，
+# 图片直接从磁盘流式读取，不再以 base64 内嵌进页面字符串。
+import mimetypes
+import os
+
+from PySide6.QtCore import (QByteArray, QFile, QIODevice, QObject, QRunnable, QThreadPool, QUrlQuery, Qt,
+                            Signal)
+from PySide6.QtGui import QImage, QImageReader
+from PySide6.QtWebEngineCore import (QWebEngineProfile, QWebEngineUrlRequestJob,
+                                     QWebEngineUrlScheme, QWebEngineUrlSchemeHandler)
+
+from app.data.database import get_mistake_image
+from app.logic.image_store import IMAGES_DIR, PREVIEW_DIR_NAME, preview_cache_key
+from app.utils.renderer import IMAGE_HOST, IMAGE_SCHEME, IMAGE_SIZE_PREVIEW, IMAGE_SIZE_WIDTHS
+
+# 缩小后的预览图缓存目录
+PREVIEW_CACHE_DIR = os.path.join(IMAGES_DIR, PREVIEW_DIR_NAME)
+
+
+def register_image_scheme():
+    """
+    注册 folio-img 协议。必须在创建 QApplication 之前调用。
+    """
+    if QWebEngineUrlScheme.schemeByName(IMAGE_SCHEME.encode()).name():
+        return
+    scheme = QWebEngineUrlScheme(IMAGE_SCHEME.encode())
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def generate_preview(image_path, cache_base, max_width):
+    """
+    将原图缩小到 max_width 宽度，保存为 cache_base + .png|.jpg（有透明通道时用 PNG），返回缓存文件路径。
+    先写入临时文件再改名，读取方不会看到写了一半的文件。失败时返回 None。
+    """
+    image = QImage(image_path)
+    if image.isNull():
+        return None
+    scaled = image.scaledToWidth(max_width, Qt.SmoothTransformation)
+    ext, fmt = (".png", "PNG") if scaled.hasAlphaChannel() else (".jpg", "JPG")
+    os.makedirs(os.path.dirname(cache_base), exist_ok=True)
+    cached = cache_base + ext
+    temp_path = cached + ".tmp"
+    if not scaled.save(temp_path, fmt, 85):
+        return None
+    os.replace(temp_path, cached)
+    return cached
+
+
+class _PreviewSignals(QObject):
+    finished = Signal(str)  # 缓存文件名前缀
+
+
+class _PreviewTask(QRunnable):
+    """
+    在线程池中生成预览图，完成后通过信号回到界面线程。
+    """
+
+    def __init__(self, image_path, cache_base, max_width, signals):
+        super().__init__()
+        self.image_path = image_path
+        self.cache_base = cache_base
+        self.max_width = max_width
+        self.signals = signals
+
+    def run(self):
+        try:
+            generate_preview(self.image_path, self.cache_base, self.max_width)
+        except OSError as e:
+            print(f"生成预览图失败: {e}")
+        finally:
+            self.signals.finished.emit(self.cache_base)
+
+
+class ImageSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    处理 folio-img 请求。
+
+    print 尺寸直接以 QFile 流式返回原图；preview 尺寸优先返回磁盘上缓存的缩小图，
+    还没有缓存时先返回原图，同时在线程池中生成预览图，大图的解码和缩放不占用界面线程。
+    原图的修改时间变化后会重新生成预览图。
+    """
+
+    def __init__(self, parent=None, cache_dir=PREVIEW_CACHE_DIR):
+        super().__init__(parent)
+        self.cache_dir = cache_dir
+        # 正在生成的预览图（缓存文件名前缀），同一张图不重复提交
+        self._pending = set()
+        self._preview_signals = _PreviewSignals(self)
+        self._preview_signals.finished.connect(self._on_preview_finished)
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        size = QUrlQuery(url).queryItemValue("size") or IMAGE_SIZE_PREVIEW
+        try:
+            mistake_id = int(url.path().strip("/"))
+        except ValueError:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlInvalid)
+            return
+        if url.host() != IMAGE_HOST or size not in IMAGE_SIZE_WIDTHS:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlInvalid)
+            return
+
+        image_path = get_mistake_image(mistake_id)
+        if not image_path or not os.path.exists(image_path):
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+
+        max_width = IMAGE_SIZE_WIDTHS[size]
+        if max_width is not None:
+            image_path = self._preview_path(image_path, max_width)
+
+        device = QFile(image_path, self)
+        if not device.open(QIODevice.ReadOnly):
+            device.deleteLater()
+            job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+            return
+        # 请求结束（job 销毁）后再释放文件
+        job.destroyed.connect(device.deleteLater)
+        mime_type = mimetypes.guess_type(image_path)[0] or "image/jpeg"
+        job.reply(QByteArray(mime_type.encode()), device)
+
+    def _preview_path(self, image_path, max_width):
+        """
+        返回这次请求应读取的文件：已缓存的预览图；原图本身够小或预览图尚未生成时为原图。
+        只读取文件头判断尺寸，不在界面线程上解码图片。
+        """
+        stat = os.stat(image_path)
+        cache_base = os.path.join(self.cache_dir, f"{preview_cache_key(image_path, stat.st_mtime_ns)}_{max_width}")
+        for ext in (".png", ".jpg"):
+            if os.path.exists(cache_base + ext):
+                return cache_base + ext
+
+        width = QImageReader(image_path).size().width()
+        if 0 <= width <= max_width:
+            return image_path
+        if cache_base not in self._pending:
+            self._pending.add(cache_base)
+            QThreadPool.globalInstance().start(
+                _PreviewTask(image_path, cache_base, max_width, self._preview_signals))
+        return image_path
+
+    def _on_preview_finished(self, cache_base):
+        self._pending.discard(cache_base)
+
+
+def install_image_scheme_handler(profile=None):
+    """
+    在 WebEngine 配置（默认为全局默认配置）上安装 folio-img 处理器，重复调用不会重复安装。
+    """
+    profile = profile or QWebEngineProfile.defaultProfile()
+    if profile.urlSchemeHandler(IMAGE_SCHEME.encode()) is None:
+        profile.installUrlSchemeHandler(IMAGE_SCHEME.encode(), ImageSchemeHandler(profile))
@@ -0,0 +1,226 @@
+# app/utils/katex_prerender.py
+# 保存错题时在无界面的 JS 引擎 (QJSEngine) 中预渲染 LaTeX，
+# 预览、复习和导出直接使用存储的 HTML，无需再在 Chromium 中跑 auto-render。
+import functools
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+
+from app.utils.renderer import KATEX_ASSETS_DIR
+
+# 预渲染输出格式版本，修改拆分/输出逻辑时递增，使已存储的结果失效
+PRERENDER_FORMAT = 1
+
+# 与 auto-render 保持一致的分隔符及顺序
+_DELIMITERS = [
+    ("$$", "$$", True),
+    ("$", "$", False),
+    ("\\[", "\\]", True),
+    ("\\(", "\\)", False),
+]
+_LEFT_DELIMITER_RE = re.compile("|".join(re.escape(left) for left, _, _ in _DELIMITERS))
+
+# 需要预渲染的文本字段及其对应的 HTML 列
+PRERENDER_FIELDS = (
+    ("question_desc", "question_html"),
+    ("correct_answer", "answer_html"),
+    ("mistake_reason", "reason_html"),
+)
+
+_RENDER_FUNCTION = """
+(function(tex, displayMode) {
+    try {
+        return {html: katex.renderToString(tex, {displayMode: displayMode, throwOnError: true, strict: false}), error: ""};
+    } catch (e) {
+        return {html: "", error: String(e && e.message ? e.message : e)};
+    }
+})
+"""
+
+
+@functools.lru_cache(maxsize=1)
+def get_katex_version():
+    """
+    从 katex.min.js 中读取 KaTeX 版本号，读取失败时返回 "unknown"。
+    """
+    try:
+        with open(os.path.join(KATEX_ASSETS_DIR, 'katex.min.js'), 'r', encoding='utf-8') as f:
+            match = re.search(r'version:"([^"]+)"', f.read())
+    except OSError:
+        return "unknown"
+    return match.group(1) if match else "unknown"
+
+
+def compute_render_key(question_desc, correct_answer, mistake_reason):
+    """
+    计算预渲染结果的校验键。文本或 KaTeX 版本变化时键随之变化，旧结果即失效。
+    """
+    digest = hashlib.sha1(f"{get_katex_version()}/{PRERENDER_FORMAT}".encode('utf-8'))
+    for text in (question_desc, correct_answer, mistake_reason):
+        digest.update(b"\x00")
+        digest.update((text or "").encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _find_end_of_math(delimiter, text, start):
+    """
+    查找公式结束分隔符的位置，跳过转义字符和花括号内的内容（与 auto-render 相同）。
+    """
+    index = start
+    brace_level = 0
+    while index < len(text):
+        character = text[index]
+        if brace_level <= 0 and text.startswith(delimiter, index):
+            return index
+        elif character == "\\":
+            index += 1
+        elif character == "{":
+            brace_level += 1
+        elif character == "}":
+            brace_level -= 1
+        index += 1
+    return -1
+
+
+def split_at_delimiters(text):
+    """
+    将文本拆分为普通文本段和公式段。
+    返回 (kind, content, raw, display) 元组列表，kind 为 "text" 或 "math"。
+    """
+    segments = []
+    while True:
+        match = _LEFT_DELIMITER_RE.search(text)
+        if not match:
+            break
+        if match.start() > 0:
+            segments.append(("text", text[:match.start()], text[:match.start()], False))
+            text = text[match.start():]
+        left, right, display = next(d for d in _DELIMITERS if text.startswith(d[0]))
+        end = _find_end_of_math(right, text, len(left))
+        if end == -1:
+            break
+        raw = text[:end + len(right)]
+        segments.append(("math", text[len(left):end], raw, display))
+        text = text[end + len(right):]
+    if text:
+        segments.append(("text", text, text, False))
+    return segments
+
+
+class KatexPrerenderer:
+    """
+    在 QJSEngine 中加载 katex.min.js，把文本中的公式渲染成静态 HTML。
+    QJSEngine 有线程归属，因此每个线程使用自己的实例（见 get_prerenderer）。
+    """
+
+    def __init__(self):
+        from PySide6.QtQml import QJSEngine
+
+        self._engine = QJSEngine()
+        with open(os.path.join(KATEX_ASSETS_DIR, 'katex.min.js'), 'r', encoding='utf-8') as f:
+            # katex.min.js 是 UMD 包，在没有 window/self 的环境中挂到 this 上
+            result = self._engine.evaluate("var self = this;\n" + f.read())
+        if result.isError():
+            raise RuntimeError(f"加载 KaTeX 失败: {result.toString()}")
+        self._render = self._engine.evaluate(_RENDER_FUNCTION)
+
+    def render_tex(self, tex, display_mode):
+        """
+        渲染单个公式，返回 (html, error)。
+        """
+        from PySide6.QtQml import QJSValue
+
+        result = self._render.call([QJSValue(tex), QJSValue(display_mode)])
+        return result.property("html").toString(), result.property("error").toString()
+
+    def render_text(self, text):
+        """
+        渲染一段混排文本，返回 (html, errors)。
+        普通文本原样保留；解析失败的公式保留原始写法，与 auto-render 的行为一致。
+        """
+        parts = []
+        errors = []
+        for kind, content, raw, display in split_at_delimiters(text or ""):
+            if kind == "text":
+                parts.append(content)
+                continue
+            # 原文作为 HTML 插入页面，公式中的实体（如 &lt;）在浏览器中会先被解码
+            rendered, error = self.render_tex(html.unescape(content), display)
+            if error:
+                errors.append(error)
+                parts.append(raw)
+            else:
+                parts.append(rendered)
+        return "".join(parts), errors
+
+
+_local = threading.local()
+
+
+def get_prerenderer():
+    """
+    返回当前线程的 KatexPrerenderer；没有 Qt 应用实例或 KaTeX 无法加载时返回 None。
+    """
+    from PySide6.QtCore import QCoreApplication
+
+    if QCoreApplication.instance() is None:
+        return None
+    prerenderer = getattr(_local, 'prerenderer', None)
+    if prerenderer is None:
+        try:
+            prerenderer = KatexPrerenderer()
+        except (OSError, RuntimeError) as e:
+            print(f"KaTeX 预渲染不可用: {e}")
+            return None
+        _local.prerenderer = prerenderer
+    return prerenderer
+
+
+def prerender_mistake(data):
+    """
+    预渲染错题的题目、答案和错误原因，返回需要写入数据库的列。
+    预渲染不可用时各列为 None，页面会回退到浏览器端渲染。
+    """
+    columns = {html_column: None for _, html_column in PRERENDER_FIELDS}
+    columns.update(render_errors=None, render_key=None)
+
+    prerenderer = get_prerenderer()
+    if prerenderer is None:
+        return columns
+
+    all_errors = []
+    for text_column, html_column in PRERENDER_FIELDS:
+        rendered, errors = prerenderer.render_text(data.get(text_column))
+        columns[html_column] = rendered
+        all_errors.extend(errors)
+    columns['render_errors'] = json.dumps(all_errors, ensure_ascii=False) if all_errors else None
+    columns['render_key'] = compute_render_key(
+        data.get('question_desc'), data.get('correct_answer'), data.get('mistake_reason'))
+    return columns
+
+
+def main():
+    """
+    命令行入口：为已有错题批量补全预渲染结果。
+    用法: python -m app.utils.katex_prerender [--force]
+    """
+    import argparse
+    from PySide6.QtCore import QCoreApplication
+    from app.data.database import init_db, backfill_rendered_html
+
+    parser = argparse.ArgumentParser(description="批量预渲染错题中的 LaTeX 公式")
+    parser.add_argument("--force", action="store_true", help="忽略校验键，重新渲染所有错题")
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    init_db()
+    count = backfill_rendered_html(force=args.force,
+                                   progress=lambda done, total: print(f"已预渲染 {done}/{total}"))
+    print(f"完成，共更新 {count} 条错题。")
+
+
+if __name__ == '__main__':
+    main()
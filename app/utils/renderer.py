@@ -1,115 +1,52 @@
 # app/utils/renderer.py
 import os
 import base64
+import threading
 
-def render_html_with_katex(mistake_data, show_answer=True):
-    """
-    将错题数据渲染成包含KaTeX的HTML页面。
-    
-    :param mistake_data: 包含错题信息的字典。
-    :param show_answer: 是否显示答案和解析。
-    :return: 渲染好的HTML字符串。
-    """
-    
-    # --- In-memory KaTeX Assets ---
-    # To avoid issues with local file access (file:/// protocol),
-    # we embed the content of KaTeX's CSS and JS files directly into the HTML.
-    
-    # Get the absolute path to the assets directory
-    assets_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'katex'))
-
-    # Read the content of the asset files
-    try:
-        with open(os.path.join(assets_dir, 'katex.min.css'), 'r', encoding='utf-8') as f:
-            katex_css = f.read()
-        with open(os.path.join(assets_dir, 'katex.min.js'), 'r', encoding='utf-8') as f:
-            katex_js = f.read()
-        with open(os.path.join(assets_dir, 'auto-render.min.js'), 'r', encoding='utf-8') as f:
-            auto_render_js = f.read()
-    except FileNotFoundError as e:
-        # Handle cases where asset files might be missing
-        return f"Error: KaTeX asset file not found. {e}"
+from app.utils.tracing import traced
 
-    # Directly use the original text; frontend CSS and JS will handle rendering
-    question_desc = mistake_data['question_desc']
-    correct_answer = mistake_data['correct_answer']
-    mistake_reason = mistake_data['mistake_reason']
+# KaTeX 资源目录及需要内嵌到页面中的文件
+KATEX_ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'assets', 'katex'))
+KATEX_ASSET_FILES = ('katex.min.css', 'katex.min.js', 'auto-render.min.js')
 
-    # 构建答案和解析部分
-    answer_html = ""
-    if show_answer:
-        answer_html = f"""
-            <hr>
-            <h3>正确答案:</h3>
-            <div id="answer" class="content-box">{correct_answer}</div>
-            
-            <hr>
-            <h3>错误原因分析:</h3>
-            <div id="reason" class="content-box">{mistake_reason}</div>
-        """
+# 配图通过自定义协议 folio-img://mistake/<错题ID>?size=<尺寸> 加载（见 app.utils.image_scheme）。
+# 错题 ID 放在路径中：协议按主机名语法注册，纯数字的主机名会被 Chromium 规范化为 IPv4 地址（1 -> 0.0.0.1）。
+# 预览图限制最大宽度，打印使用原图；尺寸为 None 时退回 base64 内嵌。
+IMAGE_SCHEME = "folio-img"
+IMAGE_HOST = "mistake"
+IMAGE_SIZE_PREVIEW = "preview"
+IMAGE_SIZE_PRINT = "print"
+IMAGE_SIZE_WIDTHS = {
+    IMAGE_SIZE_PREVIEW: 1024,
+    IMAGE_SIZE_PRINT: None,
+}
 
-    # 构建题目图片部分
-    image_html = ""
-    if mistake_data.get('question_image') and os.path.exists(mistake_data['question_image']):
-        try:
-            # 读取图片并转换为base64
-            with open(mistake_data['question_image'], 'rb') as img_file:
-                img_data = img_file.read()
-                base64_data = base64.b64encode(img_data).decode('utf-8')
-            
-            # 获取图片MIME类型
-            ext = os.path.splitext(mistake_data['question_image'])[1].lower()
-            mime_type = f"image/{ext[1:]}" if ext else "image/jpeg"
-            
-            # 构建Data URI
-            data_uri = f"data:{mime_type};base64,{base64_data}"
-            
-            image_html = f"""
-                <hr>
-                <h3>题目配图:</h3>
-                <img src="{data_uri}" alt="题目图片" style="max-width: 100%; height: auto;">
-            """
-        except Exception as e:
-            print(f"Error loading image: {e}")
-            image_html = f"""
-                <hr>
-                <h3>题目配图:</h3>
-                <div style="color: red;">图片加载失败: {str(e)}</div>
-            """
-
-    html_template = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>错题详情</title>
-        <style>{katex_css}</style>
-        <script>{katex_js}</script>
-        <script>{auto_render_js}</script>
+# 页面中除 KaTeX 资源外的静态部分。这里不是 f-string，花括号无需转义。
+_PAGE_STYLE = """
         <style>
-            body {{
+            body {
                 font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", "PingFang SC", "Hiragino Sans GB", "Microsoft YaHei", "Helvetica Neue", Helvetica, Arial, sans-serif;
                 font-size: 16px;
                 line-height: 1.6;
                 margin: 10px;
                 background-color: #f8f9fa;
                 color: #212529;
-            }}
-            .container {{
+            }
+            .container {
                 max-width: 700px;
                 margin: 0 auto;
                 background-color: #ffffff;
                 padding: 15px;
                 border-radius: 6px;
                 box-shadow: 0 1px 6px rgba(0,0,0,0.03);
-            }}
-            h2, h3 {{
+            }
+            h2, h3 {
                 color: #0056b3;
                 border-bottom: 2px solid #e9ecef;
                 padding-bottom: 5px;
                 margin-top: 15px;
-            }}
-            .content-box {{
+            }
+            .content-box {
                 padding: 10px;
                 background-color: #f8f9fa;
                 border: 1px solid #dee2e6;
@@ -117,8 +54,8 @@ def render_html_with_katex(mistake_data, show_answer=True):
                 margin-top: 8px;
                 word-wrap: break-word; /* 确保长内容能换行 */
                 white-space: pre-wrap; /* 保留换行符和空格，以便KaTeX正确处理块公式 */
-            }}
-            .meta-info {{
+            }
+            .meta-info {
                 color: #FF33FF;
                 border-bottom: 2px solid #e9ecef;
                 padding-bottom: 5px;
@@ -126,45 +63,369 @@ def render_html_with_katex(mistake_data, show_answer=True):
                 margin-bottom: 12px;
                 font-size: 1em; /* Adjust font size as needed */
                 text-align: center;
-            }}
-            img {{
+            }
+            img {
                 max-width: 100%;
                 height: auto;
                 border-radius: 4px;
-            }}
+            }
+            .answers-hidden .answer-section {
+                display: none;
+            }
         </style>
-    </head>
-    <body>
+"""
+
+# renderMathInElement 的公共参数，整页渲染和预览外壳共用
+KATEX_RENDER_OPTIONS = """{
+                    delimiters: [
+                        {left: "$$", right: "$$", display: true},
+                        {left: "$", right: "$", display: false},
+                        {left: "\\[", right: "\\]", display: true},
+                        {left: "\\(", right: "\\)", display: false}
+                    ],
+                    // Be less strict about what is considered valid math,
+                    // to allow for mixed text and math, and avoid warnings.
+                    strict: false,
+                    // 保存时已预渲染的内容不再重复处理
+                    ignoredClasses: ["prerendered"]
+                }"""
+
+# 整页渲染时在 DOMContentLoaded 后对整个 body 运行 auto-render
+AUTO_RENDER_SCRIPT = """
+        <script>
+            document.addEventListener('DOMContentLoaded', function() {
+                renderMathInElement(document.body, """ + KATEX_RENDER_OPTIONS + """);
+            });
+        </script>"""
+
+_DOCUMENT_CLOSE = """
+    </body>
+    </html>
+    """
+
+# 常驻预览页的外壳：内容通过 window.folio 桥接函数原地替换，
+# 公式只对新内容所在的子树重新渲染，答案的显示/隐藏只切换 CSS 类。
+# 预渲染的内容放在屏幕外不可见的 #folio-preload 中（参与排版，图片也会提前解码），
+# 显示时直接把节点移入 #folio-root。
+_SHELL_BODY = """
+        <div id="folio-root" class="answers-hidden"></div>
+        <div id="folio-preload" aria-hidden="true"
+             style="position: absolute; left: -10000px; top: 0; width: 700px; visibility: hidden;"></div>
+        <script>
+            window.folio = {
+                root: function() {
+                    return document.getElementById('folio-root');
+                },
+                preloadNode: function(key) {
+                    var nodes = document.getElementById('folio-preload').children;
+                    for (var i = 0; i < nodes.length; i++) {
+                        if (nodes[i].dataset.key === key) {
+                            return nodes[i];
+                        }
+                    }
+                    return null;
+                },
+                preload: function(key, html) {
+                    if (this.preloadNode(key)) {
+                        return;
+                    }
+                    var node = document.createElement('div');
+                    node.dataset.key = key;
+                    node.innerHTML = html;
+                    document.getElementById('folio-preload').appendChild(node);
+                    renderMathInElement(node, """ + KATEX_RENDER_OPTIONS + """);
+                },
+                showPreloaded: function(key, showAnswer) {
+                    var node = this.preloadNode(key);
+                    if (!node) {
+                        return false;
+                    }
+                    var root = this.root();
+                    root.replaceChildren.apply(root, Array.prototype.slice.call(node.childNodes));
+                    node.remove();
+                    root.classList.toggle('answers-hidden', !showAnswer);
+                    window.scrollTo(0, 0);
+                    return true;
+                },
+                discardPreloaded: function(keepKeys) {
+                    var nodes = Array.prototype.slice.call(document.getElementById('folio-preload').children);
+                    nodes.forEach(function(node) {
+                        if (keepKeys.indexOf(node.dataset.key) < 0) {
+                            node.remove();
+                        }
+                    });
+                },
+                setContent: function(html, showAnswer) {
+                    var root = this.root();
+                    root.innerHTML = html;
+                    root.classList.toggle('answers-hidden', !showAnswer);
+                    renderMathInElement(root, """ + KATEX_RENDER_OPTIONS + """);
+                    window.scrollTo(0, 0);
+                },
+                showAnswer: function() {
+                    this.root().classList.remove('answers-hidden');
+                }
+            };
+        </script>
+    </body>
+    </html>
+    """
+
+
+class KatexRenderer:
+    """
+    错题页面渲染器。
+
+    KaTeX 的 CSS/JS 只在首次使用时读取一次，并预先拼接成固定的页面头部；
+    之后每次渲染只生成错题自身的片段。资源文件的修改时间变化时才会重新读取。
+    """
+
+    def __init__(self, assets_dir=KATEX_ASSETS_DIR):
+        self.assets_dir = assets_dir
+        self._lock = threading.Lock()
+        self._asset_mtimes = None
+        self._page_head = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _current_mtimes(self):
+        return tuple(os.stat(os.path.join(self.assets_dir, name)).st_mtime_ns
+                     for name in KATEX_ASSET_FILES)
+
+    def _ensure_template(self):
+        """
+        确保页面头部模板可用，资源有变化时重新构建。
+        资源缺失时抛出 FileNotFoundError。
+        """
+        mtimes = self._current_mtimes()
+        with self._lock:
+            if self._page_head is not None and mtimes == self._asset_mtimes:
+                self.cache_hits += 1
+                return self._page_head
+
+            self.cache_misses += 1
+            contents = []
+            for name in KATEX_ASSET_FILES:
+                with open(os.path.join(self.assets_dir, name), 'r', encoding='utf-8') as f:
+                    contents.append(f.read())
+            katex_css, katex_js, auto_render_js = contents
+
+            self._page_head = _compose_head(
+                f"        <style>{katex_css}</style>\n"
+                f"        <script>{katex_js}</script>\n"
+                f"        <script>{auto_render_js}</script>\n"
+            )
+            self._asset_mtimes = mtimes
+            return self._page_head
+
+    def cache_stats(self):
+        """
+        返回资源缓存的命中/未命中次数。
+        """
+        with self._lock:
+            return {"hits": self.cache_hits, "misses": self.cache_misses}
+
+    @traced("render.body", size=len, size_key="bytes")
+    def render_body(self, mistake_data, show_answer=True, image_size=None):
+        """
+        只渲染错题内容片段（不含 KaTeX 资源），即页面 <body> 中的容器部分。
+        image_size 为 IMAGE_SIZE_WIDTHS 中的尺寸时配图以 folio-img 地址引用，为 None 时内嵌。
+        """
+        question_desc, correct_answer, mistake_reason, box_class = _content_fields(mistake_data)
+
+        # 构建答案和解析部分
+        answer_html = ""
+        if show_answer:
+            answer_html = f"""
+            <div class="answer-section">
+            <hr>
+            <h3>正确答案:</h3>
+            <div id="answer" class="content-box{box_class}">{correct_answer}</div>
+
+            <hr>
+            <h3>错误原因分析:</h3>
+            <div id="reason" class="content-box{box_class}">{mistake_reason}</div>
+            </div>
+        """
+
+        return f"""
         <div class="container">
             <div class="meta-info">
                 <b>学科:</b> {mistake_data['subject']} &nbsp;&nbsp;
                 <b>年级:</b> {mistake_data['grade']} {mistake_data['semester']}&nbsp;&nbsp;
                 <b>录入日期:</b> {mistake_data['record_date']}
             </div>
-            
+
             <h3>题目:</h3>
-            <div id="question" class="content-box">{question_desc}</div>
-            
-            {image_html}
+            <div id="question" class="content-box{box_class}">{question_desc}</div>
+
+            {_render_image_html(mistake_data, image_size)}
             {answer_html}
         </div>
-        
-        <script>
-            document.addEventListener('DOMContentLoaded', function() {{
-                renderMathInElement(document.body, {{
-                    delimiters: [
-                        {{left: "$$", right: "$$", display: true}},
-                        {{left: "$", right: "$", display: false}},
-                        {{left: "\\[", right: "\\]", display: true}},
-                        {{left: "\\(", right: "\\)", display: false}}
-                    ],
-                    // Be less strict about what is considered valid math,
-                    // to allow for mixed text and math, and avoid warnings.
-                    strict: false
-                }});
-            }});
-        </script>
-    </body>
-    </html>
+        """
+
+    def document_head(self, link_assets=False):
+        """
+        返回页面头部（到 <body> 为止）。
+        link_assets 为 True 时以 file:// 地址引用 KaTeX 资源而不内嵌，适用于从本地文件加载的页面，
+        字体等相对路径资源也能正常加载。资源缺失时抛出 FileNotFoundError。
+        """
+        if not link_assets:
+            return self._ensure_template()
+        url = "file:///" + self.assets_dir.replace("\\", "/").lstrip("/")
+        return _compose_head(
+            f"        <link rel=\"stylesheet\" href=\"{url}/katex.min.css\">\n"
+            f"        <script src=\"{url}/katex.min.js\"></script>\n"
+            f"        <script src=\"{url}/auto-render.min.js\"></script>\n"
+        )
+
+    def assemble_document(self, fragments, extra_style="", tail=AUTO_RENDER_SCRIPT, link_assets=False):
+        """
+        把多个内容片段组合成一个完整页面，KaTeX 头部只输出一次。
+
+        返回依次产出页面各部分的迭代器，片段在迭代时才逐个取出，
+        调用方可以边生成边写入文件，整个页面不必同时驻留内存。
+        extra_style 插入到页面样式之后，tail 放在所有片段之后、</body> 之前。
+        """
+        head = self.document_head(link_assets)
+        if extra_style:
+            head = head.replace("    </head>", extra_style + "    </head>", 1)
+        yield head
+        yield from fragments
+        yield tail
+        yield _DOCUMENT_CLOSE
+
+    def render_shell(self):
+        """
+        渲染常驻预览页的外壳（KaTeX 资源 + 空容器 + 桥接脚本），视图只需加载一次。
+        """
+        try:
+            page_head = self._ensure_template()
+        except FileNotFoundError as e:
+            return f"Error: KaTeX asset file not found. {e}"
+        return page_head + _SHELL_BODY
+
+    def render_page(self, mistake_data, show_answer=True, image_size=None):
+        """
+        渲染完整的 HTML 页面：预构建的头部 + 错题片段 + 公式渲染脚本。
+        """
+        try:
+            page_head = self._ensure_template()
+        except FileNotFoundError as e:
+            # Handle cases where asset files might be missing
+            return f"Error: KaTeX asset file not found. {e}"
+        return page_head + self.render_body(mistake_data, show_answer, image_size) + AUTO_RENDER_SCRIPT + _DOCUMENT_CLOSE
+
+
+def _compose_head(asset_tags):
+    return (
+        "\n    <!DOCTYPE html>\n    <html>\n    <head>\n"
+        "        <meta charset=\"UTF-8\">\n"
+        "        <title>错题详情</title>\n"
+        + asset_tags
+        + _PAGE_STYLE +
+        "    </head>\n    <body>\n"
+    )
+
+
+def _content_fields(mistake_data):
+    """
+    返回题目、答案、错误原因的 HTML 以及内容框的附加 CSS 类。
+    预渲染结果有效时直接使用，否则回退为原始文本，由前端 auto-render 渲染。
+    """
+    from app.utils.katex_prerender import compute_render_key
+
+    question_desc = mistake_data['question_desc']
+    correct_answer = mistake_data['correct_answer']
+    mistake_reason = mistake_data['mistake_reason']
+    render_key = mistake_data.get('render_key')
+    if render_key and render_key == compute_render_key(question_desc, correct_answer, mistake_reason):
+        return (mistake_data['question_html'], mistake_data['answer_html'],
+                mistake_data['reason_html'], " prerendered")
+    # Directly use the original text; frontend CSS and JS will handle rendering
+    return question_desc, correct_answer, mistake_reason, ""
+
+
+def image_url(mistake_id, size=IMAGE_SIZE_PREVIEW):
+    """
+    返回错题配图的 folio-img 地址。
+    """
+    return f"{IMAGE_SCHEME}://{IMAGE_HOST}/{mistake_id}?size={size}"
+
+
+def _render_image_html(mistake_data, image_size=None):
+    """
+    构建题目配图部分。指定尺寸且错题已有 ID 时引用 folio-img 地址，
+    由协议处理器从磁盘读取；否则图片以 base64 Data URI 内嵌。
+    """
+    image_path = mistake_data.get('question_image')
+    if not image_path or not os.path.exists(image_path):
+        return ""
+    if image_size is not None and mistake_data.get('id') is not None:
+        return f"""
+                <hr>
+                <h3>题目配图:</h3>
+                <img src="{image_url(mistake_data['id'], image_size)}" alt="题目图片" style="max-width: 100%; height: auto;">
+            """
+    try:
+        # 读取图片并转换为base64
+        with open(image_path, 'rb') as img_file:
+            base64_data = base64.b64encode(img_file.read()).decode('utf-8')
+
+        # 获取图片MIME类型
+        ext = os.path.splitext(image_path)[1].lower()
+        mime_type = f"image/{ext[1:]}" if ext else "image/jpeg"
+
+        # 构建Data URI
+        data_uri = f"data:{mime_type};base64,{base64_data}"
+
+        return f"""
+                <hr>
+                <h3>题目配图:</h3>
+                <img src="{data_uri}" alt="题目图片" style="max-width: 100%; height: auto;">
+            """
+    except Exception as e:
+        print(f"Error loading image: {e}")
+        return f"""
+                <hr>
+                <h3>题目配图:</h3>
+                <div style="color: red;">图片加载失败: {str(e)}</div>
+            """
+
+
+# 进程级共享的渲染器实例
+_renderer = KatexRenderer()
+
+
+def get_renderer():
+    """
+    返回进程内共享的 KatexRenderer 实例。
+    """
+    return _renderer
+
+
+def render_body_fragment(mistake_data, show_answer=True, image_size=None):
+    """
+    只渲染单条错题的内容片段，不含 KaTeX 资源，用于组合成多题页面（见 assemble_document）。
+    """
+    return _renderer.render_body(mistake_data, show_answer, image_size)
+
+
+def assemble_document(fragments, extra_style="", tail=AUTO_RENDER_SCRIPT, link_assets=False):
+    """
+    把多个内容片段组合成一个只含一份 KaTeX 头部的页面，返回按顺序产出各部分的迭代器。
+    """
+    return _renderer.assemble_document(fragments, extra_style, tail, link_assets)
+
+
+@traced("render.html_with_katex", size=len, size_key="bytes")
+def render_html_with_katex(mistake_data, show_answer=True, image_size=None):
+    """
+    将错题数据渲染成包含KaTeX的HTML页面。
+
+    :param mistake_data: 包含错题信息的字典。
+    :param show_answer: 是否显示答案和解析。
+    :param image_size: 配图尺寸（IMAGE_SIZE_PREVIEW / IMAGE_SIZE_PRINT），为 None 时图片内嵌。
+    :return: 渲染好的HTML字符串。
     """
-    return html_template
\ No newline at end of file
+    return _renderer.render_page(mistake_data, show_answer, image_size)
@@ -0,0 +1,73 @@
+# app/utils/startup_profile.py
+# 记录冷启动各阶段的耗时，使用 --profile-startup 启动时输出报告。
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# 进程开始计时的时间点（本模块应尽早导入）
+_PROCESS_START = time.perf_counter()
+
+
+class StartupProfiler:
+    """
+    启动耗时记录器。
+
+    phase() 记录一段操作的开始时间和耗时，mark() 记录某个时间点（如首次绘制）；
+    时间均相对于进程开始计时的时刻。后台阶段与界面线程的阶段可能重叠。
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.entries = []
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def _now(self):
+        return (time.perf_counter() - _PROCESS_START) * 1000
+
+    @contextmanager
+    def phase(self, name):
+        start = self._now()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.entries.append((name, start, self._now() - start))
+
+    def mark(self, name):
+        now = self._now()
+        with self._lock:
+            self.entries.append((name, now, None))
+
+    def report(self):
+        """
+        返回按开始时间排序的文本报告。
+        """
+        with self._lock:
+            entries = sorted(self.entries, key=lambda entry: entry[1])
+        # 中文表头每个字占两列宽度，少补两格以与数据列对齐
+        lines = [f"{'阶段':<22}{'开始 (ms)':>10}{'耗时 (ms)':>10}"]
+        for name, start, duration in entries:
+            duration_text = f"{duration:>12.1f}" if duration is not None else f"{'-':>12}"
+            lines.append(f"{name:<24}{start:>12.1f}{duration_text}")
+        return "\n".join(lines)
+
+    def finish(self):
+        """
+        启动完成：启用时输出一次报告。
+        """
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        print("启动耗时报告:\n" + self.report(), file=sys.stderr)
+
+
+_profiler = StartupProfiler()
+
+
+def get_startup_profiler():
+    """
+    返回进程内共享的启动耗时记录器。
+    """
+    return _profiler
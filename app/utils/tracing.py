@@ -0,0 +1,213 @@
+# app/utils/tracing.py
+# 轻量的耗时追踪：关闭时只多一次布尔判断；开启后记录每段操作的耗时和附加信息，
+# 在内存中保留滚动百分位统计，并可导出为 Chrome trace（chrome://tracing / Perfetto 可直接打开）。
+# 设置环境变量 FOLIO_TRACE=<文件路径> 启动时即开启追踪，退出时写入该文件；
+# 也可以在主窗口按 Ctrl+Shift+D 打开隐藏的调试菜单。
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+TRACE_ENV = "FOLIO_TRACE"
+# 内存中最多保留的事件数，超出后丢弃最早的事件
+MAX_EVENTS = 100000
+# 每个名称用于计算百分位的最近样本数
+STATS_WINDOW = 1000
+
+_enabled = False
+_lock = threading.Lock()
+_events = deque(maxlen=MAX_EVENTS)
+_samples = {}
+_counts = {}
+_origin = time.perf_counter()
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """
+    清空已记录的事件和统计。
+    """
+    with _lock:
+        _events.clear()
+        _samples.clear()
+        _counts.clear()
+
+
+def _record(name, start, duration, args):
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": (start - _origin) * 1e6,
+        "dur": duration * 1e6,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    }
+    with _lock:
+        _events.append(event)
+        window = _samples.get(name)
+        if window is None:
+            window = _samples[name] = deque(maxlen=STATS_WINDOW)
+        window.append(duration * 1000)
+        _counts[name] = _counts.get(name, 0) + 1
+
+
+class Span:
+    """
+    一段正在计时的操作。args 中可以在结束前补充附加信息（如行数、输出大小）。
+    可以作为上下文管理器使用，也可以跨回调手动调用 finish()。
+    """
+
+    __slots__ = ("name", "args", "_start", "_finished")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self._start = time.perf_counter()
+        self._finished = False
+
+    def finish(self, **args):
+        if self._finished:
+            return
+        self._finished = True
+        self.args.update(args)
+        _record(self.name, self._start, time.perf_counter() - self._start, self.args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.finish()
+        return False
+
+
+class _NullSpan:
+    """
+    追踪关闭时使用的空操作对象。
+    """
+
+    __slots__ = ()
+
+    @property
+    def args(self):
+        # 每次返回新的空字典，调用方写入的内容直接丢弃，不会在共享对象上累积
+        return {}
+
+    def finish(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+def span(name, **args):
+    """
+    开始计时一段操作。追踪关闭时返回共享的空对象。
+    """
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, args)
+
+
+def traced(name=None, size=None, size_key="rows"):
+    """
+    装饰器：为函数调用计时。size(result) 返回的数值记入 size_key（如返回的行数）。
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, {}) as current:
+                result = func(*args, **kwargs)
+                if size is not None:
+                    current.args[size_key] = size(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def stats():
+    """
+    返回各操作的调用次数和最近样本的 p50/p90/p99/最大耗时（毫秒）。
+    """
+    with _lock:
+        snapshot = {name: (sorted(window), _counts[name]) for name, window in _samples.items()}
+    return {
+        name: {
+            "count": count,
+            "p50_ms": _percentile(values, 0.5),
+            "p90_ms": _percentile(values, 0.9),
+            "p99_ms": _percentile(values, 0.99),
+            "max_ms": values[-1],
+        }
+        for name, (values, count) in snapshot.items()
+    }
+
+
+def format_stats():
+    """
+    以文本表格返回 stats()，按 p90 从高到低排列。
+    """
+    rows = sorted(stats().items(), key=lambda item: item[1]["p90_ms"], reverse=True)
+    lines = [f"{'name':<44}{'count':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"]
+    for name, item in rows:
+        lines.append(f"{name:<44}{item['count']:>8}{item['p50_ms']:>10.2f}{item['p90_ms']:>10.2f}"
+                     f"{item['p99_ms']:>10.2f}{item['max_ms']:>10.2f}")
+    return "\n".join(lines)
+
+
+def dump_chrome_trace(path):
+    """
+    将已记录的事件写为 Chrome trace JSON 文件，统计信息放在 metadata 中。
+    """
+    with _lock:
+        events = list(_events)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms", "metadata": {"stats": stats()}},
+                  f, ensure_ascii=False)
+
+
+def _dump_on_exit():
+    path = os.environ.get(TRACE_ENV)
+    if path and _events:
+        try:
+            dump_chrome_trace(path)
+        except OSError as e:
+            print(f"写入追踪文件失败: {e}")
+
+
+if os.environ.get(TRACE_ENV):
+    enable()
+    atexit.register(_dump_on_exit)
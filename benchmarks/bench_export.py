@@ -0,0 +1,55 @@
+# benchmarks/bench_export.py
+# 测量 PDF 导出在不同离屏页面数量下的吞吐量。
+# 用法: python -m benchmarks.bench_export [--mistakes 500] [--pages 1 2 4] [--chunk-size 50]
+# 在容器中以 root 运行时需要设置 QTWEBENGINE_CHROMIUM_FLAGS="--no-sandbox --no-zygote"。
+# 并行页面数的收益取决于 CPU 核数，结果开头会打印本机的核数。
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.data import database
+from app.utils.image_scheme import register_image_scheme
+from benchmarks.corpus import build_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 导出吞吐量测试")
+    parser.add_argument("--mistakes", type=int, default=500)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-size", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    register_image_scheme()
+    from PySide6.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+
+    from app.logic.mistake_service import MistakeService
+    from app.logic.pdf_exporter import can_merge_pdfs
+
+    if not can_merge_pdfs():
+        print("未安装 pypdf：导出不分片，页面数量对结果没有影响。")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_database(os.path.join(tmp, "bench.db"), args.mistakes, seed=args.mistakes)
+        ids = database.get_mistake_ids()
+        service = MistakeService()
+        print(f"CPU 核数: {os.cpu_count()}，错题数: {len(ids)}，分片大小: {args.chunk_size}")
+        print(f"{'pages':>5} {'seconds':>9} {'mistakes/s':>11} {'speedup':>8}")
+        baseline = None
+        for page_count in args.pages:
+            out = os.path.join(tmp, f"export-{page_count}.pdf")
+            start = time.perf_counter()
+            service.export_to_pdf(ids, out, chunk_size=args.chunk_size, page_count=page_count)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{page_count:>5} {elapsed:>9.2f} {len(ids) / elapsed:>11.1f} {baseline / elapsed:>7.2f}x")
+        database.get_connection_manager(database.DB_FILE).close_all()
+    app.quit()
+
+if __name__ == '__main__':
+    main()
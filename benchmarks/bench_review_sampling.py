@@ -0,0 +1,55 @@
+# benchmarks/bench_review_sampling.py
+# 对比复习抽题的旧实现 (ORDER BY RANDOM() LIMIT k) 与 ReviewSampler。
+# 用法: python -m benchmarks.bench_review_sampling [--sizes 10000 100000 1000000] [--count 5]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.data import database
+from app.logic.review_sampler import ReviewSampler
+from benchmarks.corpus import build_database
+
+FILTERS = {"grade": "8年级", "semester": "上册", "subject": "数学"}
+
+
+def order_by_random(count, filters):
+    conn = database.get_db_connection()
+    where = " AND ".join(f"{key} = ?" for key in filters)
+    query = "SELECT * FROM mistakes" + (f" WHERE {where}" if where else "") + " ORDER BY RANDOM() LIMIT ?"
+    return conn.execute(query, list(filters.values()) + [count]).fetchall()
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="复习抽题性能对比")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'filter':>8} {'RANDOM()':>10} {'sampler':>10} {'repeat sessions':>16}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            build_database(os.path.join(tmp, "bench.db"), size, seed=size, image_ratio=0)
+            for label, filters in (("none", {}), ("category", FILTERS)):
+                old = timed(lambda: order_by_random(args.count, filters), args.repeat)
+                fresh = timed(lambda: ReviewSampler(seed=1).sample(args.count, filters), args.repeat)
+                sampler = ReviewSampler(seed=1)
+                repeated = timed(lambda: sampler.sample(args.count, filters), args.repeat)
+                print(f"{size:>9} {label:>8} {old:>8.2f}ms {fresh:>8.2f}ms {repeated:>14.2f}ms")
+            database.get_connection_manager(database.DB_FILE).close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/corpus.py
+# 可复现的合成错题语料：中文题干、按比例混入的 LaTeX 公式和不同尺寸的配图。
+# 用法: python -m benchmarks.corpus --size 10000 --out scratch/bench.db [--seed 0] [--image-ratio 0.1]
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.data import database
+
+GRADES = ["7年级", "8年级", "9年级"]
+SEMESTERS = ["上册", "下册"]
+SUBJECTS = ["语文", "数学", "英语", "物理", "化学", "地理", "生物", "道法", "历史"]
+
+# 题干、答案和错因由这些短语随机组合
+_QUESTION_PHRASES = [
+    "已知", "如图所示", "下列说法正确的是", "求证", "一辆汽车以恒定速度行驶", "某同学在实验中发现",
+    "根据材料回答问题", "阅读下面的短文", "请计算", "化简后求值", "若方程有两个不相等的实数根",
+    "在平面直角坐标系中", "用化学方程式表示", "分析人物形象", "概括文段的主要内容", "判断并说明理由",
+]
+_ANSWER_PHRASES = [
+    "由题意可得", "所以", "因此", "综上所述", "代入计算得", "故选", "根据定理", "移项合并同类项",
+]
+_REASON_PHRASES = [
+    "审题不仔细，漏看了条件", "计算时符号出错", "公式记混了", "没有考虑特殊情况", "概念理解不清",
+    "单位换算错误", "时间不够，没有检查", "步骤跳得太快",
+]
+_FORMULAS = [
+    "$x^2 + {a}x + {b} = 0$", "$\\frac{{{a}}}{{{b}}}$", "$\\sqrt{{{a}}}$", "$v = \\frac{{s}}{{t}}$",
+    "$$S = \\pi r^2$$", "$\\sin^2\\alpha + \\cos^2\\alpha = 1$", "$F = ma$", "$y = {a}x + {b}$",
+    "$$\\int_0^{a} x^2 \\, dx = \\frac{{{a}^3}}{{3}}$$", "$\\triangle ABC \\cong \\triangle DEF$",
+    "$2H_2 + O_2 \\rightarrow 2H_2O$", "$a^{{{a}}} \\cdot a^{{{b}}} = a^{{{a}+{b}}}$",
+]
+
+# 配图尺寸 (宽, 高) 及其出现的权重：截图、扫描件和手机照片
+IMAGE_SIZES = [((640, 480), 5), ((1280, 960), 3), ((3000, 2000), 1)]
+# 每种尺寸生成的不同图片数量，错题之间会复用（与相同题目配图去重的情况类似）
+IMAGES_PER_SIZE = 4
+
+
+def _sentence(rng, phrases, latex_density):
+    parts = [rng.choice(phrases)]
+    if rng.random() < latex_density:
+        parts.append(rng.choice(_FORMULAS).format(a=rng.randint(1, 20), b=rng.randint(1, 20)))
+    parts.append(rng.choice(["，", "。", "？", "；"]))
+    return "".join(parts)
+
+
+def _text(rng, phrases, sentences, latex_density):
+    return "".join(_sentence(rng, phrases, latex_density) for _ in range(sentences))
+
+
+def generate_images(image_dir, seed=0):
+    """
+    生成各尺寸的配图（JPEG），存入内容寻址的图片仓库，返回 [(路径, 权重)] 列表。
+    """
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QImage
+
+    from app.logic.image_store import ImageStore
+
+    rng = random.Random(seed)
+    store = ImageStore(image_dir)
+    os.makedirs(image_dir, exist_ok=True)
+    images = []
+    for (width, height), weight in IMAGE_SIZES:
+        for index in range(IMAGES_PER_SIZE):
+            # 随机色块放大平滑后得到连续变化的画面，压缩后的体积与真实照片相近
+            small_width, small_height = width // 8, height // 8
+            pixels = rng.randbytes(small_width * small_height * 3)
+            small = QImage(pixels, small_width, small_height, small_width * 3, QImage.Format_RGB888)
+            image = small.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            source = os.path.join(image_dir, f"source-{width}x{height}-{index}.jpg")
+            image.save(source, "JPG", 85)
+            images.append((store.put(source), weight))
+            os.remove(source)
+    return images
+
+
+def generate_mistakes(count, seed=0, latex_density=0.5, image_ratio=0.1, images=()):
+    """
+    逐条生成错题数据字典。相同的参数生成相同的数据。
+    latex_density 为每个句子带公式的概率，image_ratio 为带配图的错题比例。
+    """
+    rng = random.Random(seed)
+    image_paths = [path for path, _ in images]
+    image_weights = [weight for _, weight in images]
+    for i in range(count):
+        image = None
+        if image_paths and rng.random() < image_ratio:
+            image = rng.choices(image_paths, image_weights)[0]
+        yield {
+            "subject": rng.choice(SUBJECTS),
+            "grade": rng.choice(GRADES),
+            "semester": rng.choice(SEMESTERS),
+            "record_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "question_desc": f"第 {i + 1} 题：" + _text(rng, _QUESTION_PHRASES, rng.randint(2, 6), latex_density),
+            "question_image": image,
+            "correct_answer": _text(rng, _ANSWER_PHRASES, rng.randint(1, 4), latex_density),
+            "mistake_reason": _text(rng, _REASON_PHRASES, rng.randint(1, 2), latex_density / 2),
+        }
+
+
+def build_database(path, size, seed=0, latex_density=0.5, image_ratio=0.1, prerender=False):
+    """
+    在 path 创建并填充合成错题库，配图保存在同目录的 images 子目录下。
+    prerender 为 True 时预渲染 LaTeX（需要 Qt 应用实例，速度较慢）。
+    """
+    database.DB_FILE = path
+    database.DB_DIR = os.path.dirname(path)
+    database.init_db()
+    images = ()
+    if image_ratio > 0:
+        images = generate_images(os.path.join(database.DB_DIR, "images"), seed)
+    database.add_mistakes(generate_mistakes(size, seed, latex_density, image_ratio, images),
+                          prerender=prerender)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成错题库")
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--out", required=True, help="数据库文件路径")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latex-density", type=float, default=0.5)
+    parser.add_argument("--image-ratio", type=float, default=0.1)
+    parser.add_argument("--prerender", action="store_true", help="同时预渲染 LaTeX")
+    args = parser.parse_args()
+
+    if args.prerender:
+        from PySide6.QtCore import QCoreApplication
+        app = QCoreApplication.instance() or QCoreApplication([])
+    build_database(os.path.abspath(args.out), args.size, args.seed, args.latex_density,
+                   args.image_ratio, args.prerender)
+    print(f"已生成 {args.size} 条错题: {args.out}")
+
+if __name__ == '__main__':
+    main()
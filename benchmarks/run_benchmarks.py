@@ -0,0 +1,196 @@
+# benchmarks/run_benchmarks.py
+# 数据、渲染和导出路径的基准测试，结果保存为 JSON，便于与之前的运行对比。
+# 用法:
+#   python -m benchmarks.run_benchmarks --sizes 1000 10000 100000 --out results.json
+#   python -m benchmarks.run_benchmarks --sizes 10000 --compare results.json
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import build_database
+from app.data import database
+from app.utils.renderer import get_renderer, render_html_with_katex
+
+CATEGORY_FILTERS = {"grade": "8年级", "semester": "上册", "subject": "数学"}
+# 语料中常见的短语，走全文索引
+KEYWORD_FILTERS = {"keyword": "实数根"}
+# 每次渲染计时使用的错题数
+RENDER_SAMPLE = 200
+# 模型计时加载的行数（第一页之后滚动加载）
+MODEL_ROWS = 1000
+
+
+def measure(func, repeat):
+    """
+    执行 repeat 次，返回耗时统计（毫秒）。
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"best_ms": min(samples), "median_ms": statistics.median(samples),
+            "mean_ms": statistics.fmean(samples), "repeat": repeat}
+
+
+def bench_render():
+    rows = [dict(row) for row in database.get_random_mistakes(RENDER_SAMPLE)]
+
+    def run():
+        for row in rows:
+            render_html_with_katex(row)
+    return run, len(rows)
+
+
+def bench_model():
+    from PySide6.QtCore import QEventLoop
+    from app.ui.mistake_table_model import MistakeTableModel
+
+    def run():
+        model = MistakeTableModel()
+        loop = QEventLoop()
+        model.first_page_loaded.connect(loop.quit)
+        model.load_failed.connect(loop.quit)
+        model.set_filters({})
+        loop.exec()
+        while model.rowCount() < MODEL_ROWS and model.canFetchMore():
+            model.fetchMore()
+    return run
+
+
+def bench_export(work_dir, count):
+    from app.logic.mistake_service import MistakeService
+
+    service = MistakeService()
+    ids = database.get_mistake_ids()[:count]
+    out = os.path.join(work_dir, "export.pdf")
+    return lambda: service.export_to_pdf(ids, out)
+
+
+def run_size(size, args, work_dir, export_available):
+    build_database(os.path.join(work_dir, "bench.db"), size, seed=args.seed,
+                   latex_density=args.latex_density, image_ratio=args.image_ratio)
+    results = {}
+    results["get_mistakes_category"] = measure(lambda: database.get_mistakes(CATEGORY_FILTERS), args.repeat)
+    results["get_mistakes_keyword"] = measure(lambda: database.get_mistakes(KEYWORD_FILTERS), args.repeat)
+    results["get_random_mistakes"] = measure(lambda: database.get_random_mistakes(20, CATEGORY_FILTERS), args.repeat)
+    render, rendered = bench_render()
+    # 本轮渲染中 KaTeX 资源缓存的命中/未命中次数（不含之前各轮）
+    cache_before = get_renderer().cache_stats()
+    timing = measure(render, args.repeat)
+    cache_after = get_renderer().cache_stats()
+    results["render_html_with_katex"] = {**timing, "items": rendered,
+                                         "asset_cache_hits": cache_after["hits"] - cache_before["hits"],
+                                         "asset_cache_misses": cache_after["misses"] - cache_before["misses"]}
+    results["model_population"] = {**measure(bench_model(), args.repeat), "items": MODEL_ROWS}
+    if export_available is True:
+        count = min(size, args.export_count)
+        results["pdf_export"] = {**measure(bench_export(work_dir, count), 1), "items": count}
+    elif export_available:
+        results["pdf_export"] = {"skipped": export_available}
+    database.get_connection_manager(database.DB_FILE).close_all()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _start_qt(with_export):
+    """
+    创建 Qt 应用实例。需要导出时使用 offscreen 平台并提前注册图片协议；
+    WebEngine 不可用时返回跳过原因，否则返回 True。
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    if not with_export:
+        from PySide6.QtCore import QCoreApplication
+        return QCoreApplication.instance() or QCoreApplication([]), None
+    try:
+        from app.utils.image_scheme import register_image_scheme
+        register_image_scheme()
+    except ImportError as e:
+        from PySide6.QtCore import QCoreApplication
+        return QCoreApplication.instance() or QCoreApplication([]), f"WebEngine 不可用: {e}"
+    from PySide6.QtCore import QCoreApplication, Qt
+    from PySide6.QtGui import QGuiApplication
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    return QGuiApplication.instance() or QGuiApplication([]), True
+
+
+def compare(results, baseline_path):
+    """
+    打印与之前结果的对比（按中位数）。
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    print(f"\n与 {baseline_path} 对比（中位数）:")
+    print(f"{'size':>8} {'benchmark':<24} {'before':>10} {'after':>10} {'change':>8}")
+    for size, benches in results.items():
+        for name, result in benches.items():
+            before = baseline.get(size, {}).get(name, {}).get("median_ms")
+            after = result.get("median_ms")
+            if before is None or after is None:
+                continue
+            print(f"{size:>8} {name:<24} {before:>8.2f}ms {after:>8.2f}ms {after / before - 1:>+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启思录基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latex-density", type=float, default=0.5)
+    parser.add_argument("--image-ratio", type=float, default=0.1)
+    parser.add_argument("--export-count", type=int, default=100, help="PDF 导出计时的错题数")
+    parser.add_argument("--no-export", action="store_true", help="跳过 PDF 导出")
+    parser.add_argument("--out", help="结果 JSON 文件路径")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    args = parser.parse_args()
+
+    app, export_available = _start_qt(not args.no_export)
+    if export_available is None:
+        export_available = False
+
+    results = {}
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            results[str(size)] = run_size(size, args, work_dir, export_available)
+        for name, result in results[str(size)].items():
+            if "skipped" in result:
+                print(f"{size:>8} {name:<24} 跳过: {result['skipped']}")
+            else:
+                print(f"{size:>8} {name:<24} 中位数 {result['median_ms']:>10.2f}ms  最快 {result['best_ms']:>10.2f}ms")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
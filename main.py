@@ -1,29 +1,53 @@
 # QisiLu/main.py - 应用主入口
 import sys
-from PySide6.QtWidgets import QApplication
-from app.data.database import init_db
-from app.ui.main_window import MainWindow
+from app.utils.startup_profile import get_startup_profiler
+
+# 启动时输出各阶段耗时（导入、数据库、WebEngine、首次绘制等）
+PROFILE_STARTUP_FLAG = "--profile-startup"
 
 def main():
     """
-    应用程序主函数。
+    应用程序主函数。带子命令（如 export/query/import/backup）运行时进入命令行模式，不创建任何窗口。
     """
-    # 初始化数据库
-    init_db()
-    
-    app = QApplication(sys.argv)
-
-    # 加载全局样式表
-    import os
-    style_file = os.path.join(os.path.dirname(__file__), "app", "ui", "style.qss")
-    try:
-        with open(style_file, "r", encoding="utf-8") as f:
-            app.setStyleSheet(f.read())
-    except Exception as e:
-        print(f"加载样式表失败: {e}")
-
-    window = MainWindow()
-    window.show()
+    profiler = get_startup_profiler()
+    with profiler.phase("import"):
+        from app.cli import COMMANDS
+        if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+            from app.cli import main as cli_main
+            sys.exit(cli_main(sys.argv[1:]))
+
+        if PROFILE_STARTUP_FLAG in sys.argv:
+            sys.argv.remove(PROFILE_STARTUP_FLAG)
+            profiler.enabled = True
+
+        from PySide6.QtCore import QCoreApplication, Qt
+        from PySide6.QtWidgets import QApplication
+        from app.ui.main_window import MainWindow
+
+    # 自定义协议必须在创建 QApplication 之前注册，QtWebEngineCore 因此在这里加载，单独计时；
+    # 预览视图（QtWebEngineWidgets）延后到窗口显示后才创建，需要提前允许共享 OpenGL 上下文
+    with profiler.phase("webengine_scheme"):
+        from app.utils.image_scheme import register_image_scheme
+        register_image_scheme()
+        QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+
+    with profiler.phase("qapplication"):
+        app = QApplication(sys.argv)
+
+        # 加载全局样式表
+        import os
+        style_file = os.path.join(os.path.dirname(__file__), "app", "ui", "style.qss")
+        try:
+            with open(style_file, "r", encoding="utf-8") as f:
+                app.setStyleSheet(f.read())
+        except Exception as e:
+            print(f"加载样式表失败: {e}")
+
+    with profiler.phase("window_shell"):
+        window = MainWindow()
+        window.show()
+    # 数据库初始化、预览视图和第一页数据在窗口显示后再加载
+    window.start_deferred_init()
     sys.exit(app.exec())
 
 if __name__ == '__main__':